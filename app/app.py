@@ -8,7 +8,9 @@ if project_root not in sys.path:
 from time import time
 import streamlit as st
 
-from src.multi_agent_system.main import run_workflow
+from src.multi_agent_system.main import stream_workflow, warm_up_workflow, health_check
+from src.multi_agent_system.config.rag_settings import load_settings
+from src.multi_agent_system.tools.ingestion_tool import ingest_documents
 
 UPLOADED_FILES_DIRECTORY = "../data/input_files"
 os.makedirs(UPLOADED_FILES_DIRECTORY, exist_ok=True)
@@ -16,6 +18,19 @@ os.makedirs(UPLOADED_FILES_DIRECTORY, exist_ok=True)
 alpha = 0.75
 text_boost = 0.2
 
+FUSION_METHODS = {
+    "Reciprocal Rank Fusion": "rrf",
+    "Weighted Score Fusion": "weighted",
+    "Text Boost": "boost",
+}
+
+@st.cache_resource
+def warm_up():
+    # una volta per processo, non per sessione: client, chain e grafo sono pronti prima della prima domanda
+    return warm_up_workflow()
+
+warm_up()
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -38,11 +53,21 @@ for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-def response_generator(response):
-    for word in response.split():
-        yield word + " "
+def response_generator(events, final):
+    # testo mostrato man mano che il grafo lo produce; la lista completa delle risposte finisce in final
+    for event in events:
+        if event["type"] == "progress":
+            yield f"\n\n*{event['text'].strip()}*\n\n"
+        elif event["type"] == "token":
+            yield event["text"]
+        elif event["type"] == "response":
+            final["response"] = event["response"]
 
 with st.sidebar:
+    with st.expander("Services"):
+        if st.button("Run health check"):
+            st.json(health_check())
+
     st.header("RAG Settings")
 
     with st.container(border=True):
@@ -151,6 +176,15 @@ with st.sidebar:
                                     - Technical content: 0.20-0.30\n
                                     - Factual queries: 0.10-0.20""")
         
+        fusion = st.selectbox("Fusion Method",
+                              options=["Reciprocal Rank Fusion", "Weighted Score Fusion", "Text Boost"],
+                              index=0,
+                              key="fusion",
+                              help="""How semantic and BM25 text rankings are combined:
+                                   - Reciprocal Rank Fusion: combines the ranks of the two lists, weighted by Alpha
+                                   - Weighted Score Fusion: Alpha * semantic score + (1 - Alpha) * BM25 score (both normalized)
+                                   - Text Boost: semantic score plus Text Boost for chunks matching the query text""")
+
         final_top_k = st.slider("Final Top K", 
                                 min_value=1, 
                                 max_value=30, 
@@ -158,6 +192,11 @@ with st.sidebar:
                                 step=1, 
                                 key="final_top_k",
                                 help="Number of final top chunks to return after combining semantic and text search (Hybrid Search).")
+
+        st.checkbox("Speculative Retrieval",
+                    value=False,
+                    key="speculative_retrieval",
+                    help="Start the document search while the query is still being classified: faster answers to medical queries, wasted searches for the others.")
         
         
         if mmr_on == "Enable MMR":
@@ -202,11 +241,20 @@ with st.sidebar:
                     "alpha": st.session_state.alpha,
                     "text_boost": st.session_state.text_boost,
                     "final_top_k": st.session_state.final_top_k,
+                    "fusion": FUSION_METHODS[st.session_state.fusion],
                     "mmr": mmr,
                     "mmr_lambda": mmr_lambda,
+                    "speculative_retrieval": st.session_state.speculative_retrieval,
                 }
                 st.session_state.rag_config = rag_config
 
+                with st.spinner("Indexing documents..."):
+                    try:
+                        manifest = ingest_documents(load_settings().with_overrides(rag_config))
+                        st.success(f"Indexed {manifest['num_chunks']} chunks from {len(manifest['files'])} files.")
+                    except Exception as e:
+                        st.error(f"Error during documents indexing: {e}")
+
                 st.success("RAG configuration submitted!")
             else:
                 st.error("Please upload one or more files to proceed with RAG.")
@@ -219,11 +267,15 @@ if prompt:
         st.markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-    with st.spinner("Agents at work..."):
-        with st.chat_message("assistant", width="stretch", avatar="assistant"):
-            response = run_workflow(prompt, st.session_state.rag_config)
-            print("STREAMLIT RESPONSE:", response)
-            for res in response:
+    with st.chat_message("assistant", width="stretch", avatar="assistant"):
+        final = {"response": []}
+        streamed = st.write_stream(response_generator(stream_workflow(prompt, st.session_state.rag_config), final))
+        streamed = streamed if isinstance(streamed, str) else "".join(str(s) for s in streamed)
+        response = final["response"]
+        print("STREAMLIT RESPONSE:", response)
+        # risposte non arrivate dallo stream (es. servite dalla cache o generate senza token)
+        for res in ([response] if isinstance(response, str) else response):
+            if res.strip() and res.strip() not in streamed:
                 st.write(res)
     st.session_state.messages.append({"role": "assistant", "content": response})
 
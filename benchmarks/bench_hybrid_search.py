@@ -0,0 +1,118 @@
+"""
+Benchmark of hybrid_search: client-side fusion (query_points + paginated MatchText scroll)
+against server-side fusion (single query_points with prefetch branches).
+
+Start a local Qdrant (docker run -p 6333:6333 qdrant/qdrant), then from the repository root:
+    python benchmarks/bench_hybrid_search.py [--url http://localhost:6333] [--points 20000] [--queries 50]
+
+Embeddings are deterministic fakes, so only the retrieval cost is measured.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import QdrantClient
+
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.tools.query_context import QueryContext
+from src.multi_agent_system.tools.rag_tool import (
+    VECTOR_SIZE,
+    recreate_collection_for_rag,
+    upsert_chunks,
+    hybrid_search,
+)
+
+COLLECTION_NAME = "bench_hybrid_search"
+CONFIG_PATH = os.path.join(project_root, "src", "multi_agent_system", "config", "rag_config.json")
+VOCABULARY = [
+    "diabetes", "insulin", "glucose", "dose", "tablet", "patient", "doctor", "treatment", "kidney",
+    "liver", "pressure", "heart", "pain", "fever", "infection", "antibiotic", "allergy", "pregnancy",
+    "breastfeeding", "side", "effects", "children", "elderly", "medicine", "symptoms", "therapy",
+]
+
+class RoundTripCounter:
+    """Proxy of QdrantClient that counts the requests sent to the server."""
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in ("query_points", "scroll", "retrieve"):
+            def counted(*args, **kwargs):
+                self.calls += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+def build_corpus(client: QdrantClient, embeddings, n_points: int, settings: Settings):
+    rng = random.Random(0)
+    recreate_collection_for_rag(client, COLLECTION_NAME, VECTOR_SIZE)
+    chunks = (
+        Document(
+            page_content=" ".join(rng.choices(VOCABULARY, k=60)),
+            metadata={"source": f"doc_{i // 50}.txt", "chunk_id": i % 50},
+        )
+        for i in range(n_points)
+    )
+    upsert_chunks(client, COLLECTION_NAME, chunks, embeddings, settings)
+
+def run(client: RoundTripCounter, embeddings, queries, settings: Settings):
+    latencies = []
+    client.calls = 0
+    for query in queries:
+        ctx = QueryContext(query, settings, embeddings)
+        ctx.vector  # l'embedding non fa parte della misura
+        start = time.perf_counter()
+        hybrid_search(client, COLLECTION_NAME, ctx)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "round_trips": client.calls / len(queries),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"),
+                        help="Qdrant url, or ':memory:' for a quick dry run in local mode")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-n", type=int, default=300)
+    args = parser.parse_args()
+
+    raw_client = QdrantClient(location=":memory:") if args.url == ":memory:" else QdrantClient(url=args.url)
+    client = RoundTripCounter(raw_client)
+    embeddings = DeterministicFakeEmbedding(size=VECTOR_SIZE)
+    base = {"top_n_semantic": args.top_n, "top_n_text": args.top_n, "final_top_k": 10, "mmr": False}
+
+    build_corpus(raw_client, embeddings, args.points, Settings(CONFIG_PATH, overrides=base))
+    rng = random.Random(1)
+    queries = [" ".join(rng.choices(VOCABULARY, k=2)) for _ in range(args.queries)]
+
+    modes = {
+        "client (query_points + scroll, boost)": {"retrieval_mode": "client", "fusion": "boost"},
+        "server (prefetch + RRF)": {"retrieval_mode": "server", "fusion": "rrf"},
+        "server (prefetch + RRF + rescore)": {"retrieval_mode": "server", "fusion": "rrf", "server_rescore": True},
+    }
+    print(f"{args.points} points, {args.queries} queries, top_n_semantic = top_n_text = {args.top_n}")
+    for name, overrides in modes.items():
+        result = run(client, embeddings, queries, Settings(CONFIG_PATH, overrides={**base, **overrides}))
+        print(f"{name:40s} p50={result['p50_ms']:8.2f} ms  p95={result['p95_ms']:8.2f} ms  "
+              f"round trips/query={result['round_trips']:.1f}")
+
+    raw_client.delete_collection(COLLECTION_NAME)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark of the multi-process parsing of the input files (iter_parsed_files) on a synthetic PDF corpus.
+
+The corpus is first loaded sequentially with PyPDFLoader.lazy_load, the loading that iter_parsed_files
+replaces. Then, for every worker count, the corpus is parsed end to end: the script reports wall time,
+speedup and parallel efficiency against the sequential loader, and checks that every run yields exactly
+the same documents (content and metadata), in the same order, as PyPDFLoader.
+
+Run from the repository root:
+    python benchmarks/bench_parallel_parsing.py --files 8 --pages 120 --workers 1 2 4
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langchain_community.document_loaders import PyPDFLoader
+from src.multi_agent_system.tools.parallel_parsing import iter_parsed_files
+
+WORDS = (
+    "patient dose treatment symptom diagnosis chronic acute therapy clinical trial blood pressure "
+    "insulin glucose cardiac renal hepatic infection antibiotic vaccine fever pain inflammation"
+).split()
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, pages, line_chars=90):
+    # PDF minimale scritto a mano (un font Type1 standard, uno stream di testo per pagina): nessuna dipendenza extra
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        lines = [text[j:j + line_chars] for j in range(0, len(text), line_chars)]
+        ops = "BT /F1 9 Tf 20 800 Td 11 TL " + " ".join(f"({pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(ops)} >>\nstream\n{ops}\nendstream")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_corpus(directory, n_files, n_pages, words_per_page, seed):
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n_files):
+        pages = [" ".join(rng.choice(WORDS) for _ in range(words_per_page)) for _ in range(n_pages)]
+        path = os.path.join(directory, f"synthetic_{i:03d}.pdf")
+        write_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+def load_corpus(paths):
+    # riferimento: caricamento sequenziale, file per file, come prima del parsing parallelo
+    return [(doc.page_content, doc.metadata) for path in paths for doc in PyPDFLoader(path).lazy_load()]
+
+def parse_corpus(paths, workers, pdf_pages_per_task):
+    documents = []
+    for path, docs in iter_parsed_files(paths, workers, pdf_pages_per_task):
+        documents.extend((doc.page_content, doc.metadata) for doc in docs)
+    return documents
+
+def main(n_files=8, n_pages=120, words_per_page=400, worker_counts=(1, 2, 4), pdf_pages_per_task=50, repeats=1, seed=0):
+    print(f"CPU cores: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_corpus(directory, n_files, n_pages, words_per_page, seed)
+        print(f"Corpus: {n_files} PDF x {n_pages} pages ({n_files * n_pages} pages), pdf_pages_per_task={pdf_pages_per_task}\n")
+
+        def timed(fn):
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = fn()
+                best = min(best, time.perf_counter() - start)
+            return best, result
+
+        baseline_time, baseline_docs = timed(lambda: load_corpus(paths))
+        print(f"{'workers':>8} {'time (s)':>10} {'pages/s':>10} {'speedup':>8} {'efficiency':>11}")
+        print(f"{'loader':>8} {baseline_time:>10.2f} {len(baseline_docs) / baseline_time:>10.0f}")
+        for workers in worker_counts:
+            best, documents = timed(lambda: parse_corpus(paths, workers, pdf_pages_per_task))
+            if documents != baseline_docs:
+                raise AssertionError(f"workers={workers}: documents differ from PyPDFLoader.lazy_load")
+
+            speedup = baseline_time / best
+            print(f"{workers:>8} {best:>10.2f} {len(documents) / best:>10.0f} {speedup:>7.2f}x {speedup / workers:>10.0%}")
+
+        print(f"\nAll runs yielded the same {len(baseline_docs)} documents, in the same order, as PyPDFLoader.lazy_load.")
+        if os.cpu_count() and max(worker_counts) > os.cpu_count():
+            print("⚠️ More workers than CPU cores: the speedup is bounded by the cores available.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pdf-pages-per-task", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+    main(args.files, args.pages, args.words_per_page, args.workers, args.pdf_pages_per_task, args.repeats)
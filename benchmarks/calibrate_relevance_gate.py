@@ -0,0 +1,97 @@
+"""
+Suggests the relevance gate thresholds (min_semantic_score / min_fused_score of rag_config.json)
+from a labeled query set, for the current retrieval configuration.
+
+The labeled set is a JSONL file, one query per line:
+    {"query": "What is the dose of metformin?", "relevant": true}
+where "relevant" tells whether the ingested documents can answer the query.
+Every query is run through hybrid_search on the already ingested collection, and for each score the
+threshold rejecting the most irrelevant queries while keeping at least --min-recall of the relevant ones
+is reported. With retrieval_mode="server" Qdrant returns only the fused score of each point, so
+min_semantic_score is not applied by the gate and only min_fused_score is calibrated.
+Run it from the app/ folder, like the app (real embeddings, same collection):
+    python ../benchmarks/calibrate_relevance_gate.py labeled_queries.jsonl [--min-recall 0.95]
+"""
+import os
+import sys
+import json
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from typing import List, Optional, Tuple
+
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+from src.multi_agent_system.tools.manifest import load_manifest
+from src.multi_agent_system.tools.query_context import QueryContext
+from src.multi_agent_system.tools.bm25_index import get_bm25_index
+from src.multi_agent_system.tools.vector_store import get_vector_store
+from src.multi_agent_system.tools.rag_tool import COLLECTION_NAME, hybrid_search, relevance_scores
+
+CONFIG_PATH = os.path.join(project_root, "src", "multi_agent_system", "config", "rag_config.json")
+
+def suggest_threshold(relevant: List[float], irrelevant: List[float], min_recall: float) -> Optional[Tuple[float, float, float]]:
+    """
+    Highest-rejection threshold that keeps at least min_recall of the relevant scores.
+    Returns (threshold, recall on relevant, rejection of irrelevant), or None without data.
+    """
+    if not relevant:
+        return None
+    best = None
+    for threshold in sorted(set(relevant)):
+        recall = sum(s >= threshold for s in relevant) / len(relevant)
+        if recall < min_recall:
+            break
+        rejection = sum(s < threshold for s in irrelevant) / len(irrelevant) if irrelevant else 0.0
+        if best is None or rejection > best[2]:
+            best = (threshold, recall, rejection)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("labeled_queries")
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    settings = Settings(args.config)
+    manifest = load_manifest(COLLECTION_NAME)
+    if manifest is None:
+        sys.exit(f"No manifest found for {COLLECTION_NAME}: run the ingestion first.")
+    vector_store = get_vector_store(settings, manifest, COLLECTION_NAME)
+    lexical_index = get_bm25_index(COLLECTION_NAME)
+    embedding_model = get_embedding_model()
+
+    with open(args.labeled_queries, "r") as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+
+    scores = {"min_semantic_score": ([], []), "min_fused_score": ([], [])}
+    for item in labeled:
+        ctx = QueryContext(item["query"], settings, embedding_model)
+        hybrid_search(vector_store, COLLECTION_NAME, ctx, lexical_index)
+        best_semantic, best_fused = relevance_scores(ctx)
+        # senza candidati la query è comunque scartata dal gate: non contribuisce alla soglia
+        for key, value in (("min_semantic_score", best_semantic), ("min_fused_score", best_fused)):
+            if value is not None:
+                scores[key][0 if item["relevant"] else 1].append(value)
+
+    print(f"{len(labeled)} labeled queries, fusion={settings.fusion}, alpha={settings.alpha}, retrieval_mode={settings.retrieval_mode}")
+    suggested = {}
+    for key, (relevant, irrelevant) in scores.items():
+        result = suggest_threshold(relevant, irrelevant, args.min_recall)
+        if result is None:
+            if key == "min_semantic_score" and settings.retrieval_mode == "server":
+                print(f"{key:<20} not applied with retrieval_mode=server: only the fused score is returned by Qdrant")
+            else:
+                print(f"{key:<20} not available for this configuration")
+            continue
+        threshold, recall, rejection = result
+        suggested[key] = round(threshold, 4)
+        print(f"{key:<20} {threshold:.4f}  recall {recall:.1%}  irrelevant rejected (LLM calls saved) {rejection:.1%}")
+    print("Suggested rag_config.json entries:", json.dumps(suggested))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Offline evaluation of the local pre-classifier against the logged LLM decisions.
+
+For each task (ethics, medicine) the logged decisions are split into a training and a test set;
+centroids are fitted on the training set and, for every confidence margin, the test queries are
+pre-classified as in the PreClassify node. The report shows the share of queries decided locally
+(= LLM calls saved) and the agreement of those local decisions with the LLM.
+Run it from the app/ folder (real embeddings, served from the embedding cache when already computed):
+    python ../benchmarks/eval_pre_classifier.py [--decisions ../data/classifier/decisions.jsonl] [--margins 0.02 0.05 0.1 0.15]
+"""
+import os
+import sys
+import random
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+from src.multi_agent_system.tools.query_classifier import (
+    DECISIONS_PATH,
+    FAST_PATH_LABELS,
+    TASKS,
+    CentroidClassifier,
+    load_decisions,
+    pre_classify,
+)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--decisions", default=DECISIONS_PATH)
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.02, 0.05, 0.1, 0.15, 0.2])
+    parser.add_argument("--test-fraction", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    decisions = load_decisions(args.decisions)
+    embeddings = get_embedding_model()
+    total_calls = 0
+    saved_calls = {margin: 0 for margin in args.margins}
+
+    for task in TASKS:
+        queries = list(decisions[task])
+        random.Random(args.seed).shuffle(queries)
+        n_test = int(len(queries) * args.test_fraction)
+        test, train = queries[:n_test], queries[n_test:]
+
+        if not train or not test:
+            print(f"{task}: not enough logged decisions ({len(queries)}).")
+            continue
+        vectors = np.asarray(embeddings.embed_documents(train + test), dtype=np.float32)
+        clf = CentroidClassifier.fit(vectors[:len(train)], [decisions[task][q] for q in train])
+        if clf is None:
+            print(f"{task}: not enough training decisions of both classes.")
+            continue
+
+        test_vectors = vectors[len(train):]
+        labels = [decisions[task][q] for q in test]
+        total_calls += len(test)
+        print(f"\n{task}: {len(train)} training / {len(test)} test queries (fast path for labels {sorted(FAST_PATH_LABELS[task])})")
+        print(f"{'margin':>8} {'decided locally':>16} {'agreement':>10}")
+        for margin in args.margins:
+            # stessa regola del nodo PreClassify (pre_classify), con il margine da valutare
+            local = [pre_classify({task: clf}, v, margin).get(task) for v in test_vectors]
+            decided = [
+                (decision[0], llm_label)
+                for decision, llm_label in zip(local, labels)
+                if decision is not None
+            ]
+            agreement = sum(label == llm_label for label, llm_label in decided) / len(decided) if decided else float("nan")
+            saved_calls[margin] += len(decided)
+            print(f"{margin:>8.3f} {len(decided) / len(test):>16.1%} {agreement:>10.1%}")
+
+    if total_calls:
+        print("\nLLM classification calls saved on the test queries:")
+        for margin in args.margins:
+            print(f"  margin {margin:.3f}: {saved_calls[margin]} of {total_calls} ({saved_calls[margin] / total_calls:.1%})")
+
+if __name__ == "__main__":
+    main()
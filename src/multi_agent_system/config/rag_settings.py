@@ -1,10 +1,37 @@
 import json
+import threading
+
+from typing import Dict, Optional
+
+CONFIG_PATH = "../src/multi_agent_system/config/rag_config.json"
+
+FUSION_METHODS = ("boost", "rrf", "weighted")
+RETRIEVAL_MODES = ("client", "server")
+VECTOR_BACKENDS = ("qdrant", "local", "auto")
 
 class Settings:
-    def __init__(self, config_path="../src/multi_agent_system/config/rag_config.json"):
-        with open(config_path, "r") as f:
-            config = json.load(f)
+    """
+    RAG settings: the values of rag_config.json (or of an explicit config dict) plus the overrides
+    of the caller (e.g. the sidebar form of a session). Values are validated on creation and the
+    instance is read-only, so one object can be shared by concurrent graph runs: with_overrides
+    returns a new instance instead of changing this one.
+    """
+
+    def __init__(self, config_path: str = CONFIG_PATH, overrides: dict = None, config: Optional[dict] = None):
+        if config is None:
+            with open(config_path, "r") as f:
+                config = json.load(f)
+        else:
+            config = dict(config)
+        # i valori passati esplicitamente (es. dal form della sidebar) hanno la precedenza sul file
+        if overrides:
+            config.update({k: v for k, v in overrides.items() if v is not None})
+        self._config = config
         self.qdrant_url = config.get("qdrant_url")
+        # trasporto del client Qdrant (gRPC evita la serializzazione JSON dei vettori)
+        self.prefer_grpc = config.get("prefer_grpc", False)
+        self.grpc_port = config.get("grpc_port", 6334)
+        self.qdrant_timeout = config.get("qdrant_timeout")
         self.chunk_size = config.get("chunk_size")
         self.chunk_overlap = config.get("chunk_overlap")
         self.top_n_semantic = config.get("top_n_semantic")
@@ -13,4 +40,95 @@ class Settings:
         self.text_boost = config.get("text_boost")
         self.final_top_k = config.get("final_top_k")
         self.mmr = config.get("mmr")
-        self.mmr_lambda = config.get("mmr_lambda")
\ No newline at end of file
+        self.mmr_lambda = config.get("mmr_lambda")
+        # soglie di rilevanza (None = disattivate): sotto soglia il RAG salta la chiamata LLM e passa al web search
+        self.min_semantic_score = config.get("min_semantic_score")
+        self.min_fused_score = config.get("min_fused_score")
+        # budget in token del contesto passato all'LLM del RAG (tokenizer tiktoken locale)
+        self.context_token_budget = config.get("context_token_budget") or 3000
+        self.context_encoding = config.get("context_encoding") or "cl100k_base"
+        # fusione dei ranking semantico e lessicale (BM25): "boost", "rrf" o "weighted"
+        self.fusion = config.get("fusion") or "boost"
+        self.rrf_k = config.get("rrf_k") or 60
+        # "client": fusione in Python; "server": un'unica query_points con prefetch e fusione lato Qdrant
+        self.retrieval_mode = config.get("retrieval_mode") or "client"
+        self.server_rescore = config.get("server_rescore", False)
+        # parametri della pipeline di ingestion (embedding a batch concorrenti + upload parallelo)
+        self.embed_batch_size = config.get("embed_batch_size", 64)
+        self.embed_concurrency = config.get("embed_concurrency", 4)
+        self.upsert_batch_size = config.get("upsert_batch_size", 256)
+        self.upsert_parallel = config.get("upsert_parallel", 2)
+        # parsing dei PDF in un pool di processi (0 = un worker per core, 1 = nel processo corrente),
+        # con i PDF grandi divisi in intervalli di pagine
+        self.parse_workers = config.get("parse_workers", 0)
+        self.pdf_pages_per_task = config.get("pdf_pages_per_task", 50)
+        # backend dei vettori: "qdrant", "local" (store in-process) o "auto" (local fino a local_max_points chunk)
+        self.vector_backend = config.get("vector_backend") or "auto"
+        self.local_max_points = config.get("local_max_points", 20000)
+        self.local_store_dtype = config.get("local_store_dtype") or "float32"
+        # pre-classificatore locale: decide da solo solo se il margine tra i centroidi supera questa soglia
+        self.pre_classifier = config.get("pre_classifier", True)
+        self.pre_classifier_margin = config.get("pre_classifier_margin") or 0.1
+        # registra le decisioni dei classificatori LLM (con il testo delle query) per addestrare il pre-classificatore
+        self.log_classifier_decisions = config.get("log_classifier_decisions") or False
+        # cache semantica delle risposte del RAG: similarità coseno minima perché due domande siano la stessa,
+        # durata delle risposte e numero massimo di voci (quest'ultimo è del processo, letto da rag_config.json)
+        self.answer_cache = config.get("answer_cache", True)
+        self.answer_cache_threshold = config.get("answer_cache_threshold") or 0.97
+        self.answer_cache_ttl_seconds = config.get("answer_cache_ttl_seconds") or 3600
+        self.answer_cache_max_entries = config.get("answer_cache_max_entries") or 1000
+        # retrieval avviato in parallelo ai classificatori, usato solo se la query va al RAG
+        self.speculative_retrieval = config.get("speculative_retrieval") or False
+        self._validate()
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"Settings are read-only (cannot set '{name}'): use with_overrides.")
+        super().__setattr__(name, value)
+
+    def _validate(self):
+        errors = []
+
+        def check(condition: bool, message: str):
+            if not condition:
+                errors.append(message)
+
+        for name in ("chunk_size", "top_n_semantic", "top_n_text", "final_top_k", "context_token_budget", "pdf_pages_per_task", "answer_cache_max_entries"):
+            value = getattr(self, name)
+            check(value is None or (isinstance(value, int) and value > 0), f"{name} must be a positive integer, got {value!r}")
+        if self.chunk_overlap is not None:
+            check(isinstance(self.chunk_overlap, int) and self.chunk_overlap >= 0, f"chunk_overlap must be a non-negative integer, got {self.chunk_overlap!r}")
+            if isinstance(self.chunk_size, int) and isinstance(self.chunk_overlap, int):
+                check(self.chunk_overlap < self.chunk_size, f"chunk_overlap ({self.chunk_overlap}) must be smaller than chunk_size ({self.chunk_size})")
+        check(isinstance(self.parse_workers, int) and self.parse_workers >= 0, f"parse_workers must be a non-negative integer, got {self.parse_workers!r}")
+        for name in ("alpha", "mmr_lambda", "answer_cache_threshold"):
+            value = getattr(self, name)
+            check(value is None or 0 <= value <= 1, f"{name} must be between 0 and 1, got {value!r}")
+        for name in ("text_boost", "pre_classifier_margin"):
+            value = getattr(self, name)
+            check(value is None or value >= 0, f"{name} must be non-negative, got {value!r}")
+        check(self.answer_cache_ttl_seconds > 0, f"answer_cache_ttl_seconds must be positive, got {self.answer_cache_ttl_seconds!r}")
+        check(self.fusion in FUSION_METHODS, f"fusion must be one of {FUSION_METHODS}, got {self.fusion!r}")
+        check(self.retrieval_mode in RETRIEVAL_MODES, f"retrieval_mode must be one of {RETRIEVAL_MODES}, got {self.retrieval_mode!r}")
+        check(self.vector_backend in VECTOR_BACKENDS, f"vector_backend must be one of {VECTOR_BACKENDS}, got {self.vector_backend!r}")
+        if errors:
+            raise ValueError("Invalid RAG settings: " + "; ".join(errors))
+
+    def with_overrides(self, overrides: Optional[dict]) -> "Settings":
+        """New settings with the given values on top of these (None values are ignored)."""
+        return Settings(config=self._config, overrides=overrides)
+
+    def as_dict(self) -> dict:
+        """Resolved values (defaults included), e.g. for logging or as a cache key."""
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+_base_settings: Dict[str, Settings] = {}
+_base_settings_lock = threading.Lock()
+
+def load_settings(config_path: str = CONFIG_PATH) -> Settings:
+    """Settings of rag_config.json, read once per process: the requests apply their overrides in memory."""
+    with _base_settings_lock:
+        if config_path not in _base_settings:
+            _base_settings[config_path] = Settings(config_path)
+        return _base_settings[config_path]
@@ -1,39 +1,56 @@
-from src.multi_agent_system.nodes.agents.check_ethics_agent import check_query_ethics
-from src.multi_agent_system.nodes.functions.ethics_router import ethics_router
+from src.multi_agent_system.nodes.agents.check_ethics_agent import check_query_ethics, acheck_query_ethics
 from src.multi_agent_system.nodes.functions.not_etchis_handler import not_ethics_handler
-from src.multi_agent_system.nodes.agents.check_medicine_agent import check_query_medicine
-from src.multi_agent_system.nodes.functions.medicine_router import medicine_router
-from src.multi_agent_system.nodes.agents.rag_agent import medical_rag
+from src.multi_agent_system.nodes.agents.check_medicine_agent import check_query_medicine, acheck_query_medicine
+from src.multi_agent_system.nodes.functions.query_router import route_query, query_router
+from src.multi_agent_system.nodes.functions.speculate_retrieval import speculate_retrieval
+from src.multi_agent_system.nodes.functions.pre_classify import pre_classify_query, apre_classify_query
+from src.multi_agent_system.nodes.functions.lookup_answer_cache import lookup_answer_cache, alookup_answer_cache, answer_cache_router
+from src.multi_agent_system.nodes.agents.rag_agent import medical_rag, amedical_rag
 from src.multi_agent_system.nodes.functions.rag_router import rag_router
-from src.multi_agent_system.nodes.agents.web_search_agent import web_search_agent
+from src.multi_agent_system.nodes.agents.web_search_agent import web_search_agent, aweb_search_agent
 
 from src.multi_agent_system.state.workflow_state import AppState
 
 from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableLambda
+from src.multi_agent_system.resources import register_resource
 
 graph_builder = StateGraph(AppState)
 
-graph_builder.add_node("CheckEthics", check_query_ethics)
+# i nodi con I/O hanno anche una variante async: graph.invoke usa la prima, graph.ainvoke / graph.astream la seconda
+graph_builder.add_node("PreClassify", RunnableLambda(pre_classify_query, afunc=apre_classify_query))
+graph_builder.add_node("CheckEthics", RunnableLambda(check_query_ethics, afunc=acheck_query_ethics))
 graph_builder.add_node("NotEthics", not_ethics_handler)
-graph_builder.add_node("CheckMedicine", check_query_medicine)
-graph_builder.add_node("Rag", medical_rag)
-graph_builder.add_node("WebSearch", web_search_agent)
+graph_builder.add_node("CheckMedicine", RunnableLambda(check_query_medicine, afunc=acheck_query_medicine))
+graph_builder.add_node("SpeculateRetrieval", speculate_retrieval)
+graph_builder.add_node("RouteQuery", route_query)
+graph_builder.add_node("AnswerCache", RunnableLambda(lookup_answer_cache, afunc=alookup_answer_cache))
+graph_builder.add_node("Rag", RunnableLambda(medical_rag, afunc=amedical_rag))
+graph_builder.add_node("WebSearch", RunnableLambda(web_search_agent, afunc=aweb_search_agent))
 
-graph_builder.add_edge(START, "CheckEthics")
+# il pre-classificatore locale decide le query facili; i due classificatori LLM (solo per le altre)
+# partono insieme e si ricongiungono in RouteQuery, con il retrieval speculativo avviato subito se abilitato
+graph_builder.add_edge(START, "PreClassify")
+graph_builder.add_edge("PreClassify", "CheckEthics")
+graph_builder.add_edge("PreClassify", "CheckMedicine")
+graph_builder.add_edge(START, "SpeculateRetrieval")
+graph_builder.add_edge(["CheckEthics", "CheckMedicine", "SpeculateRetrieval"], "RouteQuery")
 
-graph_builder.add_conditional_edges("CheckEthics", 
-                                   ethics_router, 
+graph_builder.add_conditional_edges("RouteQuery",
+                                   query_router,
                                    {
                                        "Unethical": "NotEthics",
-                                       "Ethical": "CheckMedicine"
+                                       "Web Search": "WebSearch",
+                                       "Executing RAG": "AnswerCache"
                                    })
 
-graph_builder.add_conditional_edges("CheckMedicine",
-                                      medicine_router,
-                                      {
-                                        "Web Search": "WebSearch",
-                                        "Executing RAG": "Rag"
-                                      })
+# la cache delle risposte si consulta solo dopo i controlli etico e medico, sul ramo del RAG
+graph_builder.add_conditional_edges("AnswerCache",
+                                   answer_cache_router,
+                                   {
+                                       "END": END,
+                                       "Rag": "Rag"
+                                   })
 
 graph_builder.add_conditional_edges("Rag",
                                    rag_router,
@@ -43,4 +60,7 @@ graph_builder.add_conditional_edges("Rag",
                                    })
 
 graph_builder.add_edge("WebSearch", END)
-graph_builder.add_edge("NotEthics", END)
\ No newline at end of file
+graph_builder.add_edge("NotEthics", END)
+
+# grafo compilato una sola volta per processo, condiviso da tutte le richieste
+register_resource("graph", graph_builder.compile)
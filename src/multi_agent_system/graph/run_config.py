@@ -0,0 +1,19 @@
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_config
+
+from src.multi_agent_system.config.rag_settings import Settings, load_settings
+
+# chiave del run config di LangGraph con le impostazioni RAG della richiesta
+RAG_SETTINGS_KEY = "rag_settings"
+
+def run_config(settings: Settings) -> RunnableConfig:
+    """Run config of one graph execution, carrying the (read-only) RAG settings of the request."""
+    return {"configurable": {RAG_SETTINGS_KEY: settings}}
+
+def get_run_settings() -> Settings:
+    """RAG settings of the running graph; outside a graph run (e.g. from a script) the ones of rag_config.json."""
+    try:
+        config = get_config()
+    except RuntimeError:
+        return load_settings()
+    return config.get("configurable", {}).get(RAG_SETTINGS_KEY) or load_settings()
@@ -0,0 +1,22 @@
+from typing import Any, Optional
+
+from langgraph.config import get_stream_writer
+
+def _writer() -> Optional[Any]:
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        # nodo chiamato fuori da un grafo (es. da uno script): nessuno stream da alimentare
+        return None
+
+def emit_progress(text: str):
+    """Sends a progress message of a node to the 'custom' stream of the graph."""
+    writer = _writer()
+    if writer is not None:
+        writer({"type": "progress", "text": text})
+
+def emit_token(text: str):
+    """Sends a piece of the final answer to the 'custom' stream of the graph."""
+    writer = _writer()
+    if writer is not None and text:
+        writer({"type": "token", "text": text})
@@ -1,43 +1,105 @@
-import json
+from typing import AsyncIterator, Iterator, Optional
 
-from src.multi_agent_system.graph.graph import graph_builder
+from langchain_core.messages import AIMessageChunk
 
-QDRANT_URL = "http://localhost:6333"
+import src.multi_agent_system.graph.graph  # registra il grafo compilato tra le risorse
+from src.multi_agent_system.graph.run_config import run_config
+from src.multi_agent_system.config.rag_settings import load_settings
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+from src.multi_agent_system.resources import get_resource, warm_up_resources, resources_health_check
+from src.multi_agent_system.tools.async_runtime import run_async, await_on_event_loop
+from src.multi_agent_system.tools.answer_cache import get_answer_cache, is_cacheable_answer
 
-rag_config_dict = {
-    "qdrant_url": QDRANT_URL,
-    "chunk_size": None,
-    "chunk_overlap": None,
-    "top_n_semantic": None,
-    "top_n_text": None,
-    "alpha": None,
-    "text_boost": None,
-    "final_top_k": None,
-    "mmr": None,
-    "mmr_lambda": None,
-}
-
-def run_workflow(query: str, rag_config: dict):
-    
-    for key in rag_config:
-        if key in rag_config:
-            rag_config_dict[key] = rag_config[key]
-    
-    
-    #if any(value is None for value in rag_config_dict.values()):
-    #   raise ValueError("Error: All RAG configuration parameters must be set.")
-    
-    print("RAG CONFIG IN RUN WORKFLOW:", rag_config_dict)
+# nodi i cui token LLM vanno inoltrati così come sono all'interfaccia
+STREAMED_LLM_NODES = {"WebSearch"}
 
+async def _astream_workflow(query: str, rag_config: dict) -> AsyncIterator[dict]:
+    # impostazioni della sola richiesta: rag_config.json (letto una volta) + i valori della sessione, in memoria
     try:
-        with open("../src/multi_agent_system/config/rag_config.json", "w") as f:
-            json.dump(rag_config_dict, f, indent=4)
-    except Exception as e:
-        print("Error converting RAG config dictionary to JSON file:", str(e))
+        settings = load_settings().with_overrides(rag_config)
+    except ValueError as e:
+        print(str(e))
+        yield {"type": "response", "response": [str(e)]}
+        return
 
-    graph = graph_builder.compile()
+    print("RAG CONFIG IN RUN WORKFLOW:", settings.as_dict())
 
-    graph_response = graph.invoke({"query": query})
+    graph = get_resource("graph")
+
+    graph_response = {}
+    # "custom": messaggi e token emessi dai nodi, "messages": token degli LLM chiamati dai nodi, "values": stato finale
+    async for mode, chunk in graph.astream({"query": query}, run_config(settings), stream_mode=["custom", "messages", "values"]):
+        if mode == "custom":
+            yield chunk
+        elif mode == "messages":
+            message, metadata = chunk
+            # solo la risposta finale del web search: gli altri LLM producono output strutturato, già inoltrato dai nodi
+            if metadata.get("langgraph_node") in STREAMED_LLM_NODES and isinstance(message, AIMessageChunk) \
+                    and isinstance(message.content, str) and message.content:
+                yield {"type": "token", "text": message.content}
+        else:
+            graph_response = chunk
     response = graph_response["response"]
 
-    return response
\ No newline at end of file
+    # risposta del RAG a una query passata dai controlli etico e medico e non trovata dal nodo AnswerCache
+    if is_cacheable_answer(graph_response):
+        try:
+            # vettore già calcolato dal nodo AnswerCache: qui arriva dalla cache degli embedding
+            query_vector = await get_embedding_model().aembed_query(query)
+            get_answer_cache().put(query_vector, graph_response["answer_cache_scope"], query, list(response) if isinstance(response, list) else response)
+        except Exception as e:
+            print(f"⚠️ Semantic answer cache not available: {e}")
+
+    yield {"type": "response", "response": response}
+
+async def _anext(events: AsyncIterator[dict]) -> Optional[dict]:
+    try:
+        return await events.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def astream_workflow(query: str, rag_config: dict) -> AsyncIterator[dict]:
+    """
+    Runs the workflow yielding its events as soon as they are produced:
+    {"type": "progress", "text"} for the node messages, {"type": "token", "text"} for the pieces of the answer
+    and, at the end, {"type": "response", "response"} with the full list of the responses.
+    The graph always runs on the shared event loop of the process (see async_runtime), where the async clients live:
+    every conversation is a coroutine there, not a thread blocked on the network.
+    """
+    events = _astream_workflow(query, rag_config)
+    while True:
+        event = await await_on_event_loop(_anext(events))
+        if event is None:
+            return
+        yield event
+
+def stream_workflow(query: str, rag_config: dict) -> Iterator[dict]:
+    """Sync variant of astream_workflow, for the Streamlit app: the calling thread only waits for the events."""
+    events = _astream_workflow(query, rag_config)
+    while True:
+        event = run_async(_anext(events))
+        if event is None:
+            return
+        yield event
+
+async def arun_workflow(query: str, rag_config: dict):
+    response = None
+    async for event in astream_workflow(query, rag_config):
+        if event["type"] == "response":
+            response = event["response"]
+    return response
+
+def run_workflow(query: str, rag_config: dict):
+    response = None
+    for event in stream_workflow(query, rag_config):
+        if event["type"] == "response":
+            response = event["response"]
+    return response
+
+def warm_up_workflow() -> dict:
+    """Builds once, at startup, the shared clients, tools, chains and the compiled graph used by every request."""
+    return warm_up_resources()
+
+def health_check() -> dict:
+    """Status of every shared resource, with a live call to the LLM and embedding deployments."""
+    return resources_health_check()
@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "../data/cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# limite dei parametri per singola query SQLite
+_SQL_BATCH = 500
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk store of embeddings.
+    Vectors are keyed by (deployment, sha256(text)) and stored as float32 blobs in SQLite;
+    when the number of entries exceeds max_entries the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                deployment TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (deployment, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, deployment: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), _SQL_BATCH):
+                batch = unique[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE deployment = ? AND text_hash IN ({placeholders})",
+                    [deployment, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                # aggiorna il timestamp LRU delle entry lette
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE deployment = ? AND text_hash = ?",
+                    [(now, deployment, h) for h in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, deployment: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (deployment, text_hash, np.asarray(vec, dtype=np.float32).tobytes(), now)
+            for text_hash, vec in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (deployment, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?
+                )""",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves embed_documents and embed_query from an EmbeddingCache
+    and calls the wrapped model only for the texts that have never been embedded.
+    """
+
+    def __init__(self, embeddings: Embeddings, deployment: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.deployment = deployment or ""
+        self.cache = cache
+
+    @staticmethod
+    def _missing(texts: List[str], hashes: List[str], cached: Dict[str, np.ndarray]) -> Dict[str, str]:
+        # ogni testo mancante viene inviato una sola volta, anche se ripetuto nel batch
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+        return missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [EmbeddingCache.text_hash(t) for t in texts]
+        cached = self.cache.get_many(self.deployment, hashes)
+        missing = self._missing(texts, hashes, cached)
+        if missing:
+            new_items = dict(zip(missing.keys(), self.embeddings.embed_documents(list(missing.values()))))
+            self.cache.put_many(self.deployment, new_items)
+            cached.update({h: np.asarray(v, dtype=np.float32) for h, v in new_items.items()})
+        return [cached[h].tolist() for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        text_hash = EmbeddingCache.text_hash(text)
+        cached = self.cache.get_many(self.deployment, [text_hash])
+        if text_hash in cached:
+            return cached[text_hash].tolist()
+        vec = self.embeddings.embed_query(text)
+        self.cache.put_many(self.deployment, {text_hash: vec})
+        return vec
+
+    # varianti async: le letture e scritture SQLite vanno in un thread, per non bloccare l'event loop condiviso
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [EmbeddingCache.text_hash(t) for t in texts]
+        cached = await asyncio.to_thread(self.cache.get_many, self.deployment, hashes)
+        missing = self._missing(texts, hashes, cached)
+        if missing:
+            new_items = dict(zip(missing.keys(), await self.embeddings.aembed_documents(list(missing.values()))))
+            await asyncio.to_thread(self.cache.put_many, self.deployment, new_items)
+            cached.update({h: np.asarray(v, dtype=np.float32) for h, v in new_items.items()})
+        return [cached[h].tolist() for h in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        text_hash = EmbeddingCache.text_hash(text)
+        cached = await asyncio.to_thread(self.cache.get_many, self.deployment, [text_hash])
+        if text_hash in cached:
+            return cached[text_hash].tolist()
+        vec = await self.embeddings.aembed_query(text)
+        await asyncio.to_thread(self.cache.put_many, self.deployment, {text_hash: vec})
+        return vec
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache, shared by every CachedEmbeddings instance."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
@@ -2,12 +2,30 @@ import os
 from dotenv import load_dotenv
 from langchain_openai.embeddings import AzureOpenAIEmbeddings
 
+from src.multi_agent_system.models.embedding_cache import CachedEmbeddings, get_embedding_cache
+from src.multi_agent_system.models.http_client import get_http_client, get_async_http_client
+from src.multi_agent_system.resources import register_resource, get_resource
+
 load_dotenv()
 
-def get_embedding_model():
+def build_embedding_model():
     embedding_model = AzureOpenAIEmbeddings(
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         azure_deployment=os.getenv("AZURE_EMBEDDING_DEPLOYMENT_NAME"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
+    # i testi già embeddati (chunk re-ingeriti, domande ripetute) non richiamano mai l'API
+    return CachedEmbeddings(
+        embedding_model,
+        deployment=os.getenv("AZURE_EMBEDDING_DEPLOYMENT_NAME"),
+        cache=get_embedding_cache(),
     )
-    return embedding_model
+
+# health check sul modello sottostante, non sulla cache
+register_resource("embeddings", build_embedding_model, check=lambda emb: emb.embeddings.embed_query("ping"))
+
+def get_embedding_model():
+    # istanza condivisa dal processo: nessun client ricostruito a ogni query
+    return get_resource("embeddings")
@@ -0,0 +1,16 @@
+import httpx
+import openai
+
+from src.multi_agent_system.resources import register_resource, get_resource
+
+# un solo pool di connessioni per processo, condiviso da LLM, embeddings e tool HTTP
+# (stessi timeout e limiti di default dei client openai)
+register_resource("http_client", openai.DefaultHttpxClient)
+register_resource("http_async_client", openai.DefaultAsyncHttpxClient)
+
+def get_http_client() -> httpx.Client:
+    return get_resource("http_client")
+
+def get_async_http_client() -> httpx.AsyncClient:
+    # le connessioni async sono legate all'event loop: usato dal loop condiviso del processo (vedi async_runtime)
+    return get_resource("http_async_client")
@@ -2,15 +2,25 @@ import os
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
 
+from src.multi_agent_system.models.http_client import get_http_client, get_async_http_client
+from src.multi_agent_system.resources import register_resource, get_resource
+
 load_dotenv()
 
-def get_llm():
+def build_llm():
     llm = AzureChatOpenAI(
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
         api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
     )
     return llm
 
+# health check: una chiamata da un solo token
+register_resource("llm", build_llm, check=lambda llm: llm.bind(max_tokens=1).invoke("ping"))
 
+def get_llm():
+    # istanza condivisa dal processo: nessun client ricostruito a ogni nodo
+    return get_resource("llm")
@@ -1,5 +1,8 @@
 from src.multi_agent_system.models.llm_model import get_llm
 from src.multi_agent_system.state.workflow_state import AppState, QueryEthics
+from src.multi_agent_system.tools.query_classifier import record_decision, arecord_decision
+from src.multi_agent_system.resources import register_resource, get_resource
+from src.multi_agent_system.graph.run_config import get_run_settings
 
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -30,22 +33,41 @@ prompt_template = ChatPromptTemplate.from_messages(
     ]
 ) 
 
-def check_query_ethics(state: AppState) -> AppState:
-    query = state.query
+def build_ethics_chain():
+    structured_llm = get_llm().with_structured_output(QueryEthics)
+    return prompt_template | structured_llm
+
+register_resource("ethics_chain", build_ethics_chain)
+
+def ethics_error_update(e: Exception) -> dict:
+    print(f"Error in ethics check: {e}")
+    # Fallback: mark as non-ethical if there's an error
+    return {"ethics": QueryEthics(
+        is_ethical=False,
+        confidence=0.0,
+        category="error",
+        reason=f"Error during ethics evaluation: {str(e)}"
+    )}
+
+def check_query_ethics(state: AppState) -> dict:
+    # gira in parallelo con CheckMedicine: restituisce solo il campo che scrive
+    if "ethics" in state.pre_classified:
+        return {}
+    try:
+        ethics_response = get_resource("ethics_chain").invoke({"query": state.query})
+        # le decisioni dell'LLM addestrano il pre-classificatore locale, se il log è abilitato
+        record_decision("ethics", state.query, ethics_response.is_ethical, get_run_settings())
+        return {"ethics": ethics_response}
+    except Exception as e:
+        return ethics_error_update(e)
+
+async def acheck_query_ethics(state: AppState) -> dict:
+    # variante async del nodo, usata da graph.ainvoke / graph.astream
+    if "ethics" in state.pre_classified:
+        return {}
     try:
-        llm = get_llm()
-        structured_llm = llm.with_structured_output(QueryEthics)
-        check_ethics_chain = prompt_template | structured_llm
-        ethics_response = check_ethics_chain.invoke({"query": query})
-        state.ethics = ethics_response
-        return state
+        ethics_response = await get_resource("ethics_chain").ainvoke({"query": state.query})
+        await arecord_decision("ethics", state.query, ethics_response.is_ethical, get_run_settings())
+        return {"ethics": ethics_response}
     except Exception as e:
-        print(f"Error in ethics check: {e}")
-        # Fallback: mark as non-ethical if there's an error
-        state.ethics = QueryEthics(
-            is_ethical=False,
-            confidence=0.0,
-            category="error",
-            reason=f"Error during ethics evaluation: {str(e)}"
-        )
-        return state
\ No newline at end of file
+        return ethics_error_update(e)
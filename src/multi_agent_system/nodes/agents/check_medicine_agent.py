@@ -1,5 +1,8 @@
 from src.multi_agent_system.models.llm_model import get_llm
 from src.multi_agent_system.state.workflow_state import AppState, QueryMedicine
+from src.multi_agent_system.tools.query_classifier import record_decision, arecord_decision
+from src.multi_agent_system.resources import register_resource, get_resource
+from src.multi_agent_system.graph.run_config import get_run_settings
 
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -16,20 +19,36 @@ prompt_template = ChatPromptTemplate.from_messages(
     ]
 )
 
-def check_query_medicine(state: AppState) -> AppState:
-    query = state.query
+def build_medicine_chain():
+    structured_llm = get_llm().with_structured_output(QueryMedicine)
+    return prompt_template | structured_llm
+
+register_resource("medicine_chain", build_medicine_chain)
+
+def medicine_error_update(e: Exception) -> dict:
+    print(f"Error in medicine check: {e}")
+    # Fallback: mark as non-medicine-related if there's an error
+    return {"medicine": QueryMedicine(is_medicine_related=False)}
+
+def check_query_medicine(state: AppState) -> dict:
+    # gira in parallelo con CheckEthics: restituisce solo il campo che scrive
+    if "medicine" in state.pre_classified:
+        return {}
+    try:
+        medicine_response = get_resource("medicine_chain").invoke({"query": state.query})
+        # le decisioni dell'LLM addestrano il pre-classificatore locale, se il log è abilitato
+        record_decision("medicine", state.query, medicine_response.is_medicine_related, get_run_settings())
+        return {"medicine": medicine_response}
+    except Exception as e:
+        return medicine_error_update(e)
+
+async def acheck_query_medicine(state: AppState) -> dict:
+    # variante async del nodo, usata da graph.ainvoke / graph.astream
+    if "medicine" in state.pre_classified:
+        return {}
     try:
-        llm = get_llm()
-        structured_llm = llm.with_structured_output(QueryMedicine)
-        check_medicine_chain = prompt_template | structured_llm
-        medicine_response = check_medicine_chain.invoke({"query": query})
-        state.medicine = medicine_response
-        return state
+        medicine_response = await get_resource("medicine_chain").ainvoke({"query": state.query})
+        await arecord_decision("medicine", state.query, medicine_response.is_medicine_related, get_run_settings())
+        return {"medicine": medicine_response}
     except Exception as e:
-        print(f"Error in medicine check: {e}")
-        # Fallback: mark as non-medicine-related if there's an error
-        state.medicine_check = QueryMedicine(
-            is_medicine_related=False,
-            reason=f"Error during medicine evaluation: {str(e)}"
-        )
-        return state
\ No newline at end of file
+        return medicine_error_update(e)
@@ -1,22 +1,34 @@
+import asyncio
+
 from src.multi_agent_system.models.llm_model import get_llm
-from src.multi_agent_system.state.workflow_state import AppState, RagState
-from src.multi_agent_system.tools.rag_tool import execute_rag
+from src.multi_agent_system.state.workflow_state import AppState, RagAnswer, RagState
+from src.multi_agent_system.tools.async_rag_tool import aretrieve_chunks
+from src.multi_agent_system.tools.rag_tool import COLLECTION_NAME
+from src.multi_agent_system.graph.run_config import get_run_settings
+from src.multi_agent_system.tools.context_packer import PackedContext, pack_context, indexed_chunk_overlap
+from src.multi_agent_system.graph.streaming import emit_progress, emit_token
+from src.multi_agent_system.tools.async_runtime import run_async, await_on_event_loop
+from src.multi_agent_system.tools.speculative_retrieval import consume_speculative_retrieval, aconsume_speculative_retrieval
+from src.multi_agent_system.resources import register_resource, get_resource
 from langchain_core.prompts import ChatPromptTemplate
 
+NO_INFO_RESPONSE = "I'm sorry, but I don't have the information you're looking for in the loaded documents."
+
 prompt_template = ChatPromptTemplate.from_messages(
     [
         ("system", """You are a helpful medical assistant.
         You must answer the user’s questions **only** using the information provided in the context below.
         Always respond in structured JSON format with your assessment.
+        The context is a list of numbered chunks, each starting with its number in square brackets, e.g. [1].
         - If the context contains relevant information, set:
             - The 'found_info' variable to True.
-            - The 'context' variable to the context passed in the prompt.
-            - The 'response' variable to a concise and accurate answer to the query based solely on the context. 
-            Always include in the response, the sources of the information as they appear in the context, in the format: [source: <file_name>] where <file_name> is the name of the file containing the information without the complete path.
+            - The 'answer' variable to a concise and accurate answer to the query based solely on the context.
+            - The 'citations' variable to the list of the numbers of the chunks the answer is based on, e.g. [1, 3].
+            Do not repeat the context and do not write the sources in the answer: they are added from the citations.
         - If the context does NOT contain any relevant information, set:
             - The 'found_info' variable to False.
-            - The 'context' to a empty string.
-            - The 'response' variable to "I'm sorry, but I don't have the information you're looking for in the loaded documents."""),
+            - The 'answer' variable to "I'm sorry, but I don't have the information you're looking for in the loaded documents."
+            - The 'citations' variable to an empty list."""),
         ("human","""
          Query: \n{query}\n\n
          Context: \n{context}\n\n
@@ -27,26 +39,107 @@ prompt_template = ChatPromptTemplate.from_messages(
     ]
 )
 
+def build_rag_chain():
+    llm = get_llm()
+
+    # l'LLM genera solo risposta e numeri dei chunk citati: contesto e fonti si ricavano dal retrieval
+    structured_llm = llm.with_structured_output(RagAnswer)
+    return prompt_template | structured_llm
+
+register_resource("rag_chain", build_rag_chain)
+
+class AnswerStream:
+    """Accumulates the partial structured answers of the RAG chain, forwarding only the new answer text to the stream."""
+
+    def __init__(self):
+        self.answer = RagAnswer()
+        self._streamed = ""
+
+    def add(self, partial: RagAnswer):
+        self.answer = partial
+        # l'output strutturato arriva come oggetti parziali: si inoltra allo stream solo il testo nuovo della risposta
+        if partial.answer.startswith(self._streamed):
+            emit_token(partial.answer[len(self._streamed):])
+            self._streamed = partial.answer
+
+def start_rag(variant: str = ""):
+    print(f"Executing medical_rag agent{variant}...\n")
+    emit_progress("Searching the loaded medical documents...")
+
+def no_context_result(state: AppState) -> AppState:
+    # nessun chunk sopra le soglie di rilevanza: si passa al web search senza chiamare l'LLM
+    print("No relevant context retrieved: skipping the RAG LLM call.")
+    state.rag = RagState(found_info=False, context="", response=NO_INFO_RESPONSE)
+    state.response.append(state.rag.response)
+    emit_token(state.rag.response)
+    return state
+
+def rag_result(state: AppState, packed: PackedContext, rag_answer: RagAnswer) -> AppState:
+    sources = packed.cited_sources(rag_answer.citations) if rag_answer.found_info else []
+    response = rag_answer.answer
+    if sources:
+        sources_text = "\n\n" + " ".join(f"[source: {src}]" for src in sources)
+        emit_token(sources_text)
+        response += sources_text
+    state.rag = RagState(
+        found_info=rag_answer.found_info,
+        context=packed.text if rag_answer.found_info else "",
+        response=response,
+        sources=sources,
+    )
+    state.response.append(state.rag.response)
+    return state
+
+def rag_error_result(state: AppState, e: Exception) -> AppState:
+    print(f"Error in RAG execution: {e}")
+    # Fallback: empty RAG state if there's an error
+    state.rag = RagState(
+        found_info=False,
+        context="",
+        response="Error during RAG execution: " + str(e)
+    )
+    return state
+
 def medical_rag(state: AppState) -> AppState:
-    print("Executing medical_rag agent...\n")
+    start_rag()
     query = state.query
     try:
-        context = execute_rag(query)
+        settings = get_run_settings()
+        # retrieval già avviato in modo speculativo durante la classificazione, se disponibile
+        points = consume_speculative_retrieval(state.speculation_id, query) if state.speculation_id else None
+        if points is None:
+            # ramo semantico e lessicale del retrieval in parallelo, sul loop condiviso del processo
+            points = run_async(aretrieve_chunks(query, settings))
+        if not points:
+            return no_context_result(state)
 
-        llm = get_llm()
+        # chunk adiacenti fusi e senza l'overlap usato all'ingestion, entro il budget di token del contesto
+        packed = pack_context(points, settings, indexed_chunk_overlap(COLLECTION_NAME, settings))
+        stream = AnswerStream()
+        for partial in get_resource("rag_chain").stream({"query": query, "context": packed.text}):
+            stream.add(partial)
+        return rag_result(state, packed, stream.answer)
+    except Exception as e:
+        return rag_error_result(state, e)
+
+async def amedical_rag(state: AppState) -> AppState:
+    # variante async del nodo: retrieval e generazione senza bloccare l'event loop
+    start_rag(" (async)")
+    query = state.query
+    try:
+        settings = get_run_settings()
+        points = await aconsume_speculative_retrieval(state.speculation_id, query) if state.speculation_id else None
+        if points is None:
+            # i client async del vector store vivono sul loop condiviso del processo
+            points = await await_on_event_loop(aretrieve_chunks(query, settings))
+        if not points:
+            return no_context_result(state)
 
-        structured_llm = llm.with_structured_output(RagState)
-        rag_chain = prompt_template | structured_llm
-        rag_response = rag_chain.invoke({"query": query, "context": context})
-        state.rag = rag_response
-        state.response.append(state.rag.response)
-        return state
+        chunk_overlap = await asyncio.to_thread(indexed_chunk_overlap, COLLECTION_NAME, settings)
+        packed = pack_context(points, settings, chunk_overlap)
+        stream = AnswerStream()
+        async for partial in get_resource("rag_chain").astream({"query": query, "context": packed.text}):
+            stream.add(partial)
+        return rag_result(state, packed, stream.answer)
     except Exception as e:
-        print(f"Error in RAG execution: {e}")
-        # Fallback: empty RAG state if there's an error
-        state.rag = RagState(
-            found_info=False,
-            context="",
-            response="Error during RAG execution: " + str(e)
-        )
-        return state
\ No newline at end of file
+        return rag_error_result(state, e)
@@ -1,6 +1,8 @@
 from src.multi_agent_system.models.llm_model import get_llm
 from src.multi_agent_system.state.workflow_state import AppState, QueryEthics
 from src.multi_agent_system.tools.weather_tool import get_weather
+from src.multi_agent_system.graph.streaming import emit_progress
+from src.multi_agent_system.resources import register_resource, get_resource
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
@@ -36,63 +38,88 @@ prompt_template = ChatPromptTemplate.from_messages(
     ]
 )
 
-def web_search_agent(state: AppState) -> AppState:
-    print("Web Search Agent Invoked")
-    query = state.query
-    try:
-        llm = get_llm()
+def build_tavily_search():
+    return TavilySearch(
+        max_results=2,
+        topic="general",
+        include_raw_content=True)
+
+def build_web_search_llm():
+    tools = [get_weather, get_resource("tavily_search")]
+    return get_llm().bind_tools(tools)
 
-        tavily_search_tool = TavilySearch(
-            max_results=2,
-            topic="general",
-            include_raw_content=True)
+register_resource("tavily_search", build_tavily_search)
+register_resource("web_search_llm", build_web_search_llm)
+register_resource("web_search_chain", lambda: prompt_template | get_resource("web_search_llm"))
 
-        tools = [get_weather, tavily_search_tool]
+# messaggio mostrato all'utente per ogni tool che l'LLM può scegliere
+TOOL_MESSAGES = {
+    "tavily_search": "Invoking Tavily web search tool...",
+    "get_weather": "Invoking the weather tool...",
+}
+
+def select_tool(state: AppState, ai_message: AIMessage):
+    """The tool chosen by the LLM and its call, or (None, None) if no tool was invoked."""
+    # Se non ci sono tool_calls, è un errore (non dovrebbe accadere col tuo prompt)
+    if not ai_message.tool_calls:
+        state.response.append("No tool was invoked.")
+        emit_progress("No tool was invoked.")
+        return None, None
+
+    tool_call = ai_message.tool_calls[0]
+    tools = {"tavily_search": get_resource("tavily_search"), "get_weather": get_weather}
+    if tool_call["name"] not in tools:
+        raise ValueError(f"Unknown tool: {tool_call['name']}")
+    state.response.append(TOOL_MESSAGES[tool_call["name"]] + "\n")
+    emit_progress(TOOL_MESSAGES[tool_call["name"]])
+    return tools[tool_call["name"]], tool_call
+
+def tool_result_messages(query: str, ai_message: AIMessage, tool_call: dict, tool_response) -> list:
+    # sequenza di messaggi per la seconda chiamata, che compone la risposta dal risultato del tool
+    return [
+        HumanMessage(content=query),
+        ai_message,  # Il messaggio AI con la tool call
+        ToolMessage(
+            tool_call_id=tool_call["id"],
+            content=str(tool_response)
+        )
+    ]
 
-        llm_with_tools = llm.bind_tools(tools)
-        web_search_chain = prompt_template | llm_with_tools
-        ai_message = web_search_chain.invoke({"query": query})
+def web_search_error(state: AppState, e: Exception) -> AppState:
+    print(f"Error in web search agent: {e}")
+    state.response.append(f"Error during web search: {str(e)}")
+    return state
 
-        # Se non ci sono tool_calls, è un errore (non dovrebbe accadere col tuo prompt)
-        if not ai_message.tool_calls:
-            state.response.append("No tool was invoked.")
+def web_search_agent(state: AppState) -> AppState:
+    print("Web Search Agent Invoked")
+    query = state.query
+    try:
+        ai_message = get_resource("web_search_chain").invoke({"query": query})
+        tool, tool_call = select_tool(state, ai_message)
+        if tool is None:
             return state
+        tool_response = tool.invoke(tool_call["args"])
+        final_response = get_resource("web_search_llm").invoke(tool_result_messages(query, ai_message, tool_call, tool_response))
 
-        tool_call = ai_message.tool_calls[0]
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
+        # i token di questa risposta arrivano all'interfaccia dallo stream "messages" del grafo
+        state.response.append(final_response.content)
+    except Exception as e:
+        return web_search_error(state, e)
+    return state
 
-        if tool_name == "tavily_search":
-            state.response.append("Invoking Tavily web search tool...\n")
-            tavily_response = tavily_search_tool.invoke(tool_args)
-            # Crea una sequenza di messaggi per il secondo invoke
-            messages = [
-                HumanMessage(content=query),
-                ai_message,  # Il messaggio AI con la tool call
-                ToolMessage(
-                    tool_call_id=tool_call["id"],
-                    content=str(tavily_response)
-                )
-            ]
-            final_response = llm_with_tools.invoke(messages)
-            
-        elif tool_name == "get_weather":
-            state.response.append("Invoking the weather tool...\n")
-            weather_response = get_weather.invoke(tool_args)
-            
-            # Crea una sequenza di messaggi per il secondo invoke
-            messages = [
-                HumanMessage(content=query),
-                ai_message,  # Il messaggio AI con la tool call
-                ToolMessage(
-                    tool_call_id=tool_call["id"],
-                    content=str(weather_response)
-                )
-            ]
-            final_response = llm_with_tools.invoke(messages)
+async def aweb_search_agent(state: AppState) -> AppState:
+    # variante async del nodo: LLM, Tavily e meteo con ainvoke
+    print("Web Search Agent Invoked (async)")
+    query = state.query
+    try:
+        ai_message = await get_resource("web_search_chain").ainvoke({"query": query})
+        tool, tool_call = select_tool(state, ai_message)
+        if tool is None:
+            return state
+        tool_response = await tool.ainvoke(tool_call["args"])
+        final_response = await get_resource("web_search_llm").ainvoke(tool_result_messages(query, ai_message, tool_call, tool_response))
 
         state.response.append(final_response.content)
     except Exception as e:
-        print(f"Error in web search agent: {e}")
-        state.response.append(f"Error during web search: {str(e)}")
-    return state
\ No newline at end of file
+        return web_search_error(state, e)
+    return state
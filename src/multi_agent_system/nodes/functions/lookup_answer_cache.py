@@ -0,0 +1,67 @@
+import asyncio
+
+from typing import Any, List, Optional
+
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.graph.run_config import get_run_settings
+from src.multi_agent_system.graph.streaming import emit_token
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+from src.multi_agent_system.state.workflow_state import AppState, RagState
+from src.multi_agent_system.tools.answer_cache import answer_cache_scope, get_answer_cache
+from src.multi_agent_system.tools.manifest import corpus_version
+from src.multi_agent_system.tools.rag_tool import COLLECTION_NAME
+from src.multi_agent_system.tools.speculative_retrieval import discard_speculative_retrieval
+
+def cached_answer_scope(settings: Settings) -> str:
+    return answer_cache_scope(settings, corpus_version(COLLECTION_NAME))
+
+def cached_answer(query_vector: List[float], scope: str, settings: Settings) -> Optional[Any]:
+    # soglia di similarità e durata delle risposte sono quelle della richiesta
+    return get_answer_cache().get(query_vector, scope, settings.answer_cache_threshold, settings.answer_cache_ttl_seconds)
+
+def lookup_answer_cache(state: AppState) -> dict:
+    # dopo CheckEthics e CheckMedicine: solo le query già ammesse al RAG possono ricevere una risposta dalla cache
+    settings = get_run_settings()
+    if not settings.answer_cache:
+        return {}
+    try:
+        scope = cached_answer_scope(settings)
+        query_vector = get_embedding_model().embed_query(state.query)
+    except Exception as e:
+        print(f"⚠️ Semantic answer cache not available: {e}")
+        return {}
+    return answer_cache_update(state, scope, cached_answer(query_vector, scope, settings))
+
+async def alookup_answer_cache(state: AppState) -> dict:
+    # variante async del nodo: la lettura del manifest va in un thread, l'embedding della query con aembed_query
+    settings = get_run_settings()
+    if not settings.answer_cache:
+        return {}
+    try:
+        scope = await asyncio.to_thread(cached_answer_scope, settings)
+        query_vector = await get_embedding_model().aembed_query(state.query)
+    except Exception as e:
+        print(f"⚠️ Semantic answer cache not available: {e}")
+        return {}
+    return answer_cache_update(state, scope, cached_answer(query_vector, scope, settings))
+
+def answer_cache_update(state: AppState, scope: str, cached_response: Optional[Any]) -> dict:
+    if cached_response is None:
+        # lo scope serve a main per salvare la risposta del RAG a fine grafo
+        return {"answer_cache_scope": scope}
+
+    print("♻️ Response served from the semantic answer cache.")
+    if state.speculation_id:
+        discard_speculative_retrieval(state.speculation_id)
+    response: List[str] = list(cached_response) if isinstance(cached_response, list) else [cached_response]
+    for text in response:
+        emit_token(text)
+    return {
+        "answer_cache_scope": scope,
+        "answer_cached": True,
+        "rag": RagState(found_info=True, response=response[-1] if response else ""),
+        "response": response,
+    }
+
+def answer_cache_router(state: AppState) -> str:
+    return "END" if state.answer_cached else "Rag"
@@ -1,10 +1,13 @@
 from src.multi_agent_system.state.workflow_state import AppState
 
+RAG_ROUTE_MESSAGE = "The query seems to be related to medicine.\n I try to answer using RAG on the loaded medical documents\n"
+WEB_ROUTE_MESSAGE = "The query seems to be unrelated to medicine.\n I try to answer using a web search.\n"
+
 def medicine_router(state: AppState) -> AppState:
     print("Medicine routing...")
     if state.medicine.is_medicine_related:
-        state.response.append("The query seems to be related to medicine.\n I try to answer using RAG on the loaded medical documents\n")
+        state.response.append(RAG_ROUTE_MESSAGE)
         return "Executing RAG" 
     else:
-        state.response.append("The query seems to be unrelated to medicine.\n I try to answer using a web search.\n")
+        state.response.append(WEB_ROUTE_MESSAGE)
         return "Web Search"
\ No newline at end of file
@@ -1,6 +1,8 @@
 from src.multi_agent_system.state.workflow_state import AppState
+from src.multi_agent_system.graph.streaming import emit_token
 
 def not_ethics_handler(state: AppState) -> AppState:
     not_ethics_reason = state.ethics.reason
     state.response = not_ethics_reason
+    emit_token(not_ethics_reason)
     return state
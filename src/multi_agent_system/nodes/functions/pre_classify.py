@@ -0,0 +1,50 @@
+import asyncio
+
+from typing import List
+
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.graph.run_config import get_run_settings
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+from src.multi_agent_system.state.workflow_state import AppState, QueryEthics, QueryMedicine
+from src.multi_agent_system.tools.query_classifier import get_pre_classifier, pre_classify
+
+def enabled_pre_classifier(settings: Settings) -> dict:
+    # vuoto se disabilitato o mai addestrato (il modello si rilegge dal disco solo quando cambia)
+    return get_pre_classifier() if settings.pre_classifier else {}
+
+def pre_classify_query(state: AppState) -> dict:
+    # le query facili si decidono con i centroidi locali: CheckEthics / CheckMedicine saltano la chiamata LLM
+    settings = get_run_settings()
+    classifiers = enabled_pre_classifier(settings)
+    if not classifiers:
+        return {}
+    try:
+        query_vector = get_embedding_model().embed_query(state.query)
+    except Exception as e:
+        print(f"Error in pre-classification: {e}")
+        return {}
+    return pre_classification_update(classifiers, query_vector, settings)
+
+async def apre_classify_query(state: AppState) -> dict:
+    # variante async del nodo, usata da graph.ainvoke / graph.astream: la lettura del modello va in un thread
+    settings = get_run_settings()
+    classifiers = await asyncio.to_thread(enabled_pre_classifier, settings)
+    if not classifiers:
+        return {}
+    try:
+        query_vector = await get_embedding_model().aembed_query(state.query)
+    except Exception as e:
+        print(f"Error in pre-classification: {e}")
+        return {}
+    return pre_classification_update(classifiers, query_vector, settings)
+
+def pre_classification_update(classifiers: dict, query_vector: List[float], settings: Settings) -> dict:
+    decided = pre_classify(classifiers, query_vector, settings.pre_classifier_margin)
+    print(f"Pre-classification: {decided or 'deferred to the LLM checks'}")
+    update = {"pre_classified": list(decided)}
+    if "ethics" in decided:
+        label, confidence = decided["ethics"]
+        update["ethics"] = QueryEthics(is_ethical=label, confidence=confidence, category="safe", reason="")
+    if "medicine" in decided:
+        update["medicine"] = QueryMedicine(is_medicine_related=decided["medicine"][0])
+    return update
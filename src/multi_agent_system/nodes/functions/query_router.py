@@ -0,0 +1,21 @@
+from src.multi_agent_system.state.workflow_state import AppState
+from src.multi_agent_system.nodes.functions.ethics_router import ethics_router
+from src.multi_agent_system.nodes.functions.medicine_router import medicine_router, RAG_ROUTE_MESSAGE, WEB_ROUTE_MESSAGE
+from src.multi_agent_system.graph.streaming import emit_progress
+from src.multi_agent_system.tools.speculative_retrieval import discard_speculative_retrieval
+
+def route_query(state: AppState) -> dict:
+    # nodo di join: CheckEthics e CheckMedicine girano in parallelo e si attendono qui
+    print("Joining ethics and medicine checks...")
+    if state.speculation_id and not (state.ethics.is_ethical and state.medicine.is_medicine_related):
+        # la query non andrà al RAG: il retrieval speculativo è inutile
+        discard_speculative_retrieval(state.speculation_id)
+    if state.ethics.is_ethical:
+        emit_progress(RAG_ROUTE_MESSAGE if state.medicine.is_medicine_related else WEB_ROUTE_MESSAGE)
+    return {}
+
+def query_router(state: AppState) -> str:
+    # prima la decisione etica, poi quella medica: stesso comportamento della catena sequenziale
+    if ethics_router(state) == "Unethical":
+        return "Unethical"
+    return medicine_router(state)
@@ -1,4 +1,5 @@
 from src.multi_agent_system.state.workflow_state import AppState
+from src.multi_agent_system.graph.streaming import emit_progress
 
 def rag_router(state: AppState) -> AppState:
     print("RAG routing...")
@@ -6,4 +7,5 @@ def rag_router(state: AppState) -> AppState:
         return "END"
     else:
         state.response.append("I'm sorry, but I don't have the information you're looking for in the loaded documents.\n I try to search on the web for you...\n")
+        emit_progress("I try to search on the web for you...")
         return "Web Search"
\ No newline at end of file
@@ -0,0 +1,11 @@
+from src.multi_agent_system.graph.run_config import get_run_settings
+from src.multi_agent_system.state.workflow_state import AppState
+from src.multi_agent_system.tools.speculative_retrieval import start_speculative_retrieval
+
+def speculate_retrieval(state: AppState) -> dict:
+    # opt-in: il retrieval parte subito, mentre CheckEthics e CheckMedicine sono ancora in corso
+    settings = get_run_settings()
+    if not settings.speculative_retrieval:
+        return {}
+    print("Starting speculative retrieval...")
+    return {"speculation_id": start_speculative_retrieval(state.query, settings)}
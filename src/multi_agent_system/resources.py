@@ -0,0 +1,90 @@
+import time
+import threading
+
+from typing import Any, Callable, Dict, Iterable, Optional
+
+class ResourceRegistry:
+    """
+    Process-wide registry of the expensive objects of the workflow (HTTP clients, LLM, embeddings,
+    tools, prompt chains, compiled graph). Every resource is built once, on first use or by warm_up,
+    and then shared by all the requests and Streamlit sessions of the process.
+    A resource can register a check, called by health_check on the built object.
+    """
+
+    def __init__(self):
+        # RLock: le factory possono chiedere altre risorse (es. una chain chiede l'LLM)
+        self._lock = threading.RLock()
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._checks: Dict[str, Callable[[Any], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], check: Optional[Callable[[Any], Any]] = None):
+        with self._lock:
+            self._factories[name] = factory
+            if check is not None:
+                self._checks[name] = check
+            # una nuova factory sostituisce l'istanza costruita con la precedente
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Resource '{name}' is not registered.")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def names(self) -> list:
+        with self._lock:
+            return list(self._factories)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """Builds the resources (all by default) ahead of the first request; a failure is reported, not raised."""
+        report = {}
+        for name in names or self.names():
+            start = time.perf_counter()
+            try:
+                self.get(name)
+                report[name] = {"ok": True, "ms": 1000 * (time.perf_counter() - start)}
+            except Exception as e:
+                report[name] = {"ok": False, "ms": 1000 * (time.perf_counter() - start), "error": str(e)}
+        return report
+
+    def health_check(self) -> Dict[str, dict]:
+        """Builds every resource and runs the registered checks (e.g. a one-token LLM call)."""
+        report = self.warm_up()
+        for name, check in list(self._checks.items()):
+            if not report[name]["ok"]:
+                continue
+            start = time.perf_counter()
+            try:
+                check(self.get(name))
+                report[name]["check_ms"] = 1000 * (time.perf_counter() - start)
+            except Exception as e:
+                report[name].update(ok=False, error=str(e))
+        return report
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+registry = ResourceRegistry()
+
+def register_resource(name: str, factory: Callable[[], Any], check: Optional[Callable[[Any], Any]] = None):
+    registry.register(name, factory, check)
+
+def get_resource(name: str) -> Any:
+    return registry.get(name)
+
+def warm_up_resources(names: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    report = registry.warm_up(names)
+    for name, item in report.items():
+        status = f"✅ {item['ms']:.0f} ms" if item["ok"] else f"⚠️ {item['error']}"
+        print(f"Warm-up {name}: {status}")
+    return report
+
+def resources_health_check() -> Dict[str, dict]:
+    return registry.health_check()
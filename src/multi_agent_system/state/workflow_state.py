@@ -10,14 +10,24 @@ class QueryEthics(BaseModel):
 class QueryMedicine(BaseModel):
     is_medicine_related: bool = Field(default=False, description="Is the query related to medicine?")    
 
+class RagAnswer(BaseModel):
+    found_info: bool = Field(default=False, description="Whether the context contains the information needed to answer")
+    answer: str = Field(default="", description="Concise answer to the query based solely on the context")
+    citations: List[int] = Field(default_factory=list, description="Numbers of the context chunks the answer is based on")
+
 class RagState(BaseModel):
     found_info: bool = Field(default=False, description="Whether relevant information was found")
     context: str = Field(default="", description="Contextual information retrieved")
     response: str = Field(default="", description="Response generated based on the context")
+    sources: List[str] = Field(default_factory=list, description="Files of the cited context chunks")
 
 class AppState(BaseModel):
     query: str = Field(default="", description="User query")
     ethics: QueryEthics = Field(default=QueryEthics(), description="Ethics check result")
     medicine: QueryMedicine = Field(default=QueryMedicine(), description="Medicine relevance check result")
     rag: RagState = Field(default=RagState(), description="RAG state information")
+    pre_classified: List[str] = Field(default_factory=list, description="Checks decided by the local pre-classifier, without LLM call")
+    speculation_id: str = Field(default="", description="Id of the speculative retrieval started for the query, if any")
+    answer_cache_scope: str = Field(default="", description="Semantic answer cache scope of the query, set when the RAG branch looked it up")
+    answer_cached: bool = Field(default=False, description="Whether the response was served from the semantic answer cache")
     response: List[str] = Field(default_factory=list, description="Response from the system")
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.multi_agent_system.config.rag_settings import Settings, load_settings
+
+# impostazioni che cambiano chunk recuperati, contesto o risposta: le altre (es. parallelismo dell'ingestion,
+# timeout, log) non devono dividere la cache
+ANSWER_SETTINGS = (
+    "chunk_size", "chunk_overlap",
+    "retrieval_mode", "server_rescore", "top_n_semantic", "top_n_text", "alpha", "text_boost", "fusion", "rrf_k",
+    "final_top_k", "mmr", "mmr_lambda", "local_store_dtype",
+    "min_semantic_score", "min_fused_score",
+    "context_token_budget", "context_encoding",
+)
+
+class CachedAnswer:
+    def __init__(self, scope: str, query: str, response: Any, created_at: float):
+        self.scope = scope
+        self.query = query
+        self.response = response
+        self.created_at = created_at
+
+def answer_cache_scope(settings: Settings, corpus_version: str) -> str:
+    """
+    Cache scope of an answer: the same question gets a new answer when the documents, the LLM deployment
+    or one of the settings that affect retrieval and generation (ANSWER_SETTINGS) change.
+    """
+    payload = json.dumps(
+        {
+            "settings": {key: getattr(settings, key) for key in ANSWER_SETTINGS},
+            "llm_deployment": os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            "corpus_version": corpus_version,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def is_cacheable_answer(state: dict) -> bool:
+    """
+    Only the answers grounded on the loaded documents are cached: a successful RAG run that ended the graph,
+    after the AnswerCache lookup (so after the ethics and medicine checks) missed.
+    Errors, fallbacks ("no information", "no tool invoked"), refusals and web search or weather answers
+    (time-sensitive, and often about an entity, e.g. a city, that the similarity threshold cannot tell apart) never are.
+    """
+    if state.get("answer_cached") or not state.get("answer_cache_scope"):
+        return False
+    rag = state.get("rag")
+    # con found_info il grafo termina dopo il nodo RAG (vedi rag_router): nessun web search nella risposta
+    found_info = rag.get("found_info") if isinstance(rag, dict) else getattr(rag, "found_info", False)
+    return bool(found_info) and bool(state.get("response"))
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of workflow responses keyed by the query embedding.
+    Normalized query vectors are kept in one preallocated float32 matrix (one row per slot):
+    a lookup is a single matrix-vector product restricted to the slots of the current scope.
+    Entries expire after ttl_seconds; when the cache is full the least recently used one is evicted.
+    Threshold and TTL can also be given per lookup (the settings of the request).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600, threshold: float = 0.97):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        # id di scope per slot (-1 = slot libero), per filtrare la ricerca senza copiare la matrice
+        self._slot_scopes = np.full(max_entries, -1, dtype=np.int64)
+        self._scope_ids: Dict[str, int] = {}
+        # slot -> risposta, in ordine di ultimo accesso (LRU)
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        return v / (np.linalg.norm(v) + 1e-12)
+
+    def _release(self, slot: int):
+        del self._entries[slot]
+        self._slot_scopes[slot] = -1
+        self._free_slots.append(slot)
+
+    def get(
+        self,
+        query_vector: List[float],
+        scope: str,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None
+    ) -> Optional[Any]:
+        threshold = self.threshold if threshold is None else threshold
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+            slots = np.flatnonzero(self._slot_scopes == scope_id) if scope_id is not None else []
+            if len(slots) == 0:
+                self.misses += 1
+                return None
+
+            scores = self._vectors[slots] @ self._normalize(query_vector)
+            for i in np.argsort(-scores):
+                if scores[i] < threshold:
+                    break
+                slot = int(slots[i])
+                entry = self._entries[slot]
+                if time.time() - entry.created_at > ttl_seconds:
+                    self._release(slot)
+                    self.expirations += 1
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return entry.response
+            self.misses += 1
+            return None
+
+    def put(self, query_vector: List[float], scope: str, query: str, response: Any):
+        vector = self._normalize(query_vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if not self._free_slots:
+                lru_slot = next(iter(self._entries))
+                self._release(lru_slot)
+                self.evictions += 1
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._slot_scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            self._entries[slot] = CachedAnswer(scope, query, response, time.time())
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+            self._scope_ids.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+_answer_cache: Optional[SemanticAnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Process-wide semantic answer cache, shared by the Streamlit sessions.
+    Its size comes from rag_config.json (answer_cache_max_entries); threshold and TTL are only the defaults of get.
+    """
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            settings = load_settings()
+            _answer_cache = SemanticAnswerCache(
+                max_entries=settings.answer_cache_max_entries,
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                threshold=settings.answer_cache_threshold,
+            )
+        return _answer_cache
+
+def get_answer_cache_metrics() -> dict:
+    return get_answer_cache().stats()
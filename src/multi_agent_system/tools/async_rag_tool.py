@@ -0,0 +1,209 @@
+import asyncio
+
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+from src.multi_agent_system.config.rag_settings import Settings, load_settings
+from src.multi_agent_system.tools.manifest import get_manifest
+from src.multi_agent_system.tools.query_context import QueryContext
+from src.multi_agent_system.tools.context_packer import pack_context, indexed_chunk_overlap
+from src.multi_agent_system.tools.bm25_index import BM25Index, get_bm25_index
+from src.multi_agent_system.tools.vector_store import get_async_vector_store, supports_query_api
+from src.multi_agent_system.tools.rag_tool import (
+    COLLECTION_NAME,
+    candidates_limit,
+    use_rank_fusion,
+    boost_fusion,
+    rank_fusion_candidates,
+    server_fusion_request,
+    vectors_matrix,
+    rank_fused,
+    apply_mmr,
+    passes_relevance_gate,
+    relevance_scores,
+    log_results,
+)
+
+import numpy as np
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import ScoredPoint, SearchParams
+
+async def aqdrant_semantic_search(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    ctx: QueryContext,
+    limit: int,
+    with_vectors: bool = False
+) -> List[ScoredPoint]:
+    res = await client.query_points(
+        collection_name=collection_name,
+        query=await ctx.avector(),
+        limit=limit,
+        with_payload=True,
+        with_vectors=with_vectors,
+        search_params=SearchParams(hnsw_ef=256, exact=False),
+    )
+    return res.points
+
+async def aqdrant_text_prefilter_ids(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    ctx: QueryContext,
+    max_hits: int
+) -> List[str]:
+    matched_ids: List[str] = []
+    next_page = None
+    while True:
+        points, next_page = await client.scroll(
+            collection_name=collection_name,
+            scroll_filter=ctx.text_filter,
+            limit=min(256, max_hits - len(matched_ids)),
+            offset=next_page,
+            with_payload=False,
+            with_vectors=False,
+        )
+        matched_ids.extend([p.id for p in points])
+        if not next_page or len(matched_ids) >= max_hits:
+            break
+    return matched_ids
+
+async def aretrieve_scored_points(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    scores: Dict[Any, float],
+    with_vectors: bool = False
+) -> List[ScoredPoint]:
+    records = await client.retrieve(
+        collection_name=collection_name,
+        ids=list(scores),
+        with_payload=True,
+        with_vectors=with_vectors,
+    )
+    return [
+        ScoredPoint(id=r.id, version=0, score=scores[r.id], payload=r.payload, vector=r.vector)
+        for r in records
+    ]
+
+async def aretrieve_vectors(client: AsyncQdrantClient, collection_name: str, ids: List[Any]) -> np.ndarray:
+    records = await client.retrieve(
+        collection_name=collection_name,
+        ids=ids,
+        with_payload=False,
+        with_vectors=True,
+    )
+    return vectors_matrix(ids, records)
+
+async def _nothing(value):
+    return value
+
+async def ahybrid_search(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    ctx: QueryContext,
+    lexical_index: Optional[BM25Index] = None
+) -> List[Any]:
+    """
+    Async variant of rag_tool.hybrid_search, with the same strategies and results.
+    The semantic branch (query embedding + dense search) and the lexical branch
+    (BM25 lookup or MatchText scroll) are issued concurrently, so the retrieval latency
+    is the max of the two branches instead of their sum.
+    As in hybrid_search, the server-side path fills only ctx.fused_scores, not ctx.semantic_scores.
+    """
+    settings = ctx.settings
+
+    if settings.retrieval_mode == "server" and supports_query_api(client):
+        await ctx.avector()
+        res = await client.query_points(
+            collection_name=collection_name,
+            **server_fusion_request(ctx, candidates_limit(settings)),
+        )
+        fused: List[Tuple[float, Any]] = [(p.score, p) for p in res.points]
+
+    elif use_rank_fusion(settings, lexical_index):
+        sem, lexical = await asyncio.gather(
+            aqdrant_semantic_search(client, collection_name, ctx, settings.top_n_semantic)
+            if settings.alpha > 0 else _nothing([]),
+            asyncio.to_thread(lexical_index.search, ctx.tokens, settings.top_n_text)
+            if settings.alpha < 1 else _nothing([]),
+        )
+        top_ids, fused_scores, lexical_only = rank_fusion_candidates(ctx, sem, lexical)
+
+        points = {p.id: p for p in sem}
+        if lexical_only:
+            for p in await aretrieve_scored_points(client, collection_name, lexical_only):
+                points[p.id] = p
+        fused = [(fused_scores[pid], points[pid]) for pid in top_ids if pid in points]
+
+    else:
+        sem, text_ids = await asyncio.gather(
+            aqdrant_semantic_search(client, collection_name, ctx, settings.top_n_semantic),
+            aqdrant_text_prefilter_ids(client, collection_name, ctx, settings.top_n_text)
+            if settings.text_boost else _nothing([]),
+        )
+        fused = boost_fusion(ctx, sem, set(text_ids)) if sem else []
+
+    if not fused:
+        return []
+
+    cut = rank_fused(ctx, fused)
+
+    if settings.mmr:
+        # vettori dei soli candidati finali, in parallelo con l'eventuale embedding della query (Text Search)
+        vectors, _ = await asyncio.gather(
+            aretrieve_vectors(client, collection_name, [p.id for _, p in cut]),
+            ctx.avector(),
+        )
+        return apply_mmr(ctx, cut, vectors)
+
+    return [p for _, p in cut]
+
+async def aretrieve_chunks(query: str, settings: Optional[Settings] = None) -> List[Any]:
+    """
+    Async variant of rag_tool.retrieve_chunks: retrieves the relevant chunks of the already ingested
+    collection through AsyncQdrantClient (or the local store).
+    Returns an empty list when nothing was ingested or the best chunk is below the relevance thresholds.
+    """
+    settings = settings or load_settings()
+
+    # manifest e indice BM25 si rileggono dal disco solo dopo una nuova ingestion, ma fuori dall'event loop
+    manifest = await asyncio.to_thread(get_manifest, COLLECTION_NAME)
+    if manifest is None:
+        print(f"No manifest found for {COLLECTION_NAME}: documents have not been ingested yet.")
+        return []
+
+    embedding_model = get_embedding_model()
+
+    vector_store = get_async_vector_store(settings, manifest, COLLECTION_NAME)
+    if not await vector_store.collection_exists(COLLECTION_NAME):
+        print(f"Collection {COLLECTION_NAME} not found in vector store: run the ingestion first.")
+        return []
+
+    ctx = QueryContext(query, settings, embedding_model)
+    lexical_index = await asyncio.to_thread(get_bm25_index, COLLECTION_NAME)
+    points = await ahybrid_search(vector_store, COLLECTION_NAME, ctx, lexical_index)
+
+    log_results(query, points)
+
+    if not passes_relevance_gate(ctx):
+        print(f"Retrieval scores {relevance_scores(ctx)} below the relevance thresholds: no context.")
+        return []
+    return points
+
+async def aexecute_rag(query: str, settings: Optional[Settings] = None) -> str:
+    """
+    Async variant of rag_tool.execute_rag: retrieves the relevant chunks of the already ingested
+    collection through AsyncQdrantClient (or the local store) and formats them for the prompt.
+
+    Args:
+        query (str): The user's natural language query.
+        settings (Settings, optional): RAG settings of the request (default: the ones of rag_config.json).
+
+    Returns:
+        str: Formatted string containing the retrieved documents' content and sources,
+             packed within the context token budget (see context_packer.pack_context).
+    """
+    settings = settings or load_settings()
+    points = await aretrieve_chunks(query, settings)
+    chunk_overlap = await asyncio.to_thread(indexed_chunk_overlap, COLLECTION_NAME, settings)
+    return pack_context(points, settings, chunk_overlap).text
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from typing import Any, Awaitable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Process-wide event loop running in a background thread.
+    Async resources (e.g. AsyncQdrantClient connections) are bound to the loop that created them:
+    running every coroutine of the sync code paths here lets them live for the whole process
+    instead of being rebuilt by each asyncio.run.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-runtime", daemon=True).start()
+            _loop = loop
+        return _loop
+
+def run_async(coro: Awaitable[Any]) -> Any:
+    """Runs a coroutine on the shared event loop from sync code and waits for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+async def await_on_event_loop(coro: Awaitable[Any]) -> Any:
+    """Awaits a coroutine on the shared event loop from any event loop (e.g. the one of an async web server)."""
+    loop = get_event_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
@@ -0,0 +1,117 @@
+import os
+import json
+import math
+import heapq
+import threading
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from src.multi_agent_system.tools.query_context import tokenize
+
+BM25_INDEXES_PATH = "../data/indexes/"
+
+class BM25Index:
+    """
+    Local inverted index over the chunks of a collection, scored with Okapi BM25.
+    Documents are identified by their Qdrant point id, so the index can be kept in sync
+    with the collection by the incremental ingestion (add / remove single chunks).
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms: Dict[str, Dict[str, int]] = {}     # point_id -> {term: tf}
+        self.doc_len: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}      # term -> {point_id: tf}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, point_id: str, text: str):
+        if point_id in self.doc_terms:
+            self.remove(point_id)
+        terms = Counter(tokenize(text))
+        self.doc_terms[point_id] = dict(terms)
+        self.doc_len[point_id] = sum(terms.values())
+        self.total_len += self.doc_len[point_id]
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[point_id] = tf
+
+    def remove(self, point_id: str):
+        terms = self.doc_terms.pop(point_id, None)
+        if terms is None:
+            return
+        self.total_len -= self.doc_len.pop(point_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(point_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_terms)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, tokens: List[str], limit: int) -> List[Tuple[str, float]]:
+        """Returns the top 'limit' (point_id, bm25_score) pairs for the given query tokens."""
+        if not self.doc_terms:
+            return []
+        avgdl = self.total_len / len(self.doc_terms)
+        scores: Dict[str, float] = {}
+        for term in set(tokens):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            for point_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[point_id] / avgdl)
+                scores[point_id] = scores.get(point_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": self.doc_terms}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        # le posting list non sono salvate: si ricostruiscono dai termini dei documenti
+        for point_id, terms in data["docs"].items():
+            index.doc_terms[point_id] = terms
+            index.doc_len[point_id] = sum(terms.values())
+            index.total_len += index.doc_len[point_id]
+            for term, tf in terms.items():
+                index.postings.setdefault(term, {})[point_id] = tf
+        return index
+
+def get_bm25_index_path(collection_name: str) -> str:
+    return os.path.join(BM25_INDEXES_PATH, f"{collection_name}_bm25.json")
+
+_loaded: Dict[str, Tuple[float, BM25Index]] = {}
+_loaded_lock = threading.Lock()
+
+def get_bm25_index(collection_name: str) -> Optional[BM25Index]:
+    """
+    Read-only BM25 index of a collection, shared by the queries of the process.
+    It is reloaded from disk only when the ingestion has written a new version.
+    """
+    path = get_bm25_index_path(collection_name)
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    with _loaded_lock:
+        cached = _loaded.get(collection_name)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, BM25Index.load(path))
+            _loaded[collection_name] = cached
+        return cached[1]
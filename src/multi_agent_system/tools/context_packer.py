@@ -0,0 +1,172 @@
+import os
+
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple
+
+from src.multi_agent_system.config.rag_settings import Settings, load_settings
+from src.multi_agent_system.tools.manifest import get_manifest
+from src.multi_agent_system.resources import register_resource
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# sotto questa lunghezza una coincidenza tra fine e inizio di due chunk può essere casuale
+MIN_OVERLAP_CHARS = 10
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str) -> Optional[Any]:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # es. file BPE non ancora in cache e nessuna connessione: si usa la stima a caratteri
+        print(f"⚠️ Tokenizer {name} not available ({e}): token counts are estimated.")
+        return None
+
+def build_context_encoding():
+    # tiktoken può scaricare il file BPE al primo uso: meglio farlo al warm-up che durante una richiesta
+    name = load_settings().context_encoding
+    encoding = get_encoding(name)
+    if encoding is None:
+        raise RuntimeError(f"Tokenizer {name} not available: token counts are estimated.")
+    return encoding
+
+register_resource("context_encoding", build_context_encoding)
+
+def count_tokens(text: str, encoding_name: str) -> int:
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, encoding_name: str) -> str:
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def strip_overlap(previous: str, following: str, max_overlap: int) -> str:
+    """Removes from 'following' the prefix already at the end of 'previous' (the chunk overlap of the splitter)."""
+    for size in range(min(len(previous), len(following), max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+def indexed_chunk_overlap(collection_name: str, settings: Settings) -> int:
+    """
+    Chunk overlap the collection was built with (recorded in its manifest): the query-time settings
+    may differ until the next ingestion. Falls back to settings.chunk_overlap without a manifest.
+    """
+    manifest = get_manifest(collection_name)
+    overlap = manifest.get("chunk_overlap") if manifest is not None else None
+    if overlap is None:
+        overlap = settings.chunk_overlap
+    return overlap or 0
+
+class ContextBlock:
+    """Consecutive chunks of one source, merged into a single block of the prompt."""
+
+    def __init__(self, source: str, chunk_id: int, text: str, rank: int):
+        self.source = source
+        self.chunk_ids = [chunk_id]
+        self.text = text
+        # posizione del chunk più rilevante del blocco nei risultati del retrieval
+        self.rank = rank
+
+    def append(self, chunk_id: int, text: str, rank: int, max_overlap: int):
+        rest = strip_overlap(self.text, text, max_overlap)
+        separator = "" if len(rest) < len(text) else "\n"
+        self.text = self.text + separator + rest
+        self.chunk_ids.append(chunk_id)
+        self.rank = min(self.rank, rank)
+
+    def render(self, number: int) -> str:
+        return f"[{number}] [source:{self.source}] {self.text}"
+
+class PackedContext:
+    def __init__(self, blocks: List[ContextBlock], text: str, raw_tokens: int, tokens: int, dropped_blocks: int):
+        self.blocks = blocks
+        self.text = text
+        self.raw_tokens = raw_tokens
+        self.tokens = tokens
+        self.dropped_blocks = dropped_blocks
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.raw_tokens - self.tokens
+
+    def cited_sources(self, citations: Iterable[int]) -> List[str]:
+        """File names of the cited blocks (1-based numbers of the prompt), without duplicates."""
+        sources: List[str] = []
+        for n in citations:
+            if 1 <= n <= len(self.blocks):
+                src = os.path.basename(self.blocks[n - 1].source)
+                if src not in sources:
+                    sources.append(src)
+        return sources
+
+def merge_adjacent_chunks(points: List[Any], max_overlap: int) -> List[ContextBlock]:
+    """
+    Groups the retrieved chunks into blocks of consecutive chunk_ids of the same source, in document order
+    and without the text repeated by the chunk overlap. Blocks are sorted by their best retrieval rank.
+    """
+    chunks: List[Tuple[str, int, int, str]] = []
+    for rank, p in enumerate(points):
+        pay = p.payload or {}
+        chunks.append((pay.get("source") or "unknown", pay.get("chunk_id", -1), rank, pay.get("text", "")))
+
+    blocks: List[ContextBlock] = []
+    last: Optional[ContextBlock] = None
+    for source, chunk_id, rank, text in sorted(chunks, key=lambda c: (c[0], c[1])):
+        if last is not None and last.source == source and chunk_id == last.chunk_ids[-1] + 1:
+            last.append(chunk_id, text, rank, max_overlap)
+            continue
+        last = ContextBlock(source, chunk_id, text, rank)
+        blocks.append(last)
+    blocks.sort(key=lambda b: b.rank)
+    return blocks
+
+def pack_context(points: List[Any], settings: Settings, chunk_overlap: Optional[int] = None) -> PackedContext:
+    """
+    Builds the RAG prompt context from the retrieved chunks: adjacent chunks of the same source are merged
+    with their overlap stripped (chunk_overlap, i.e. the one of the collection, see indexed_chunk_overlap;
+    settings.chunk_overlap if not given), blocks are ordered by relevance and added until settings.context_token_budget
+    tokens (counted with the settings.context_encoding tokenizer). Blocks that do not fit are skipped, so a
+    smaller, less relevant block can still use the remaining budget; the first block is truncated if needed.
+    """
+    encoding_name = settings.context_encoding
+    budget = settings.context_token_budget
+    if chunk_overlap is None:
+        chunk_overlap = settings.chunk_overlap or 0
+    blocks = merge_adjacent_chunks(points, max_overlap=chunk_overlap)
+
+    # costo del contesto non compattato: un blocco per chunk, con il testo completo
+    raw_tokens = sum(
+        count_tokens(f"[{i}] [source:{(p.payload or {}).get('source', 'unknown')}] {(p.payload or {}).get('text', '')}", encoding_name)
+        for i, p in enumerate(points, start=1)
+    ) + 2 * max(0, len(points) - 1)
+
+    kept: List[ContextBlock] = []
+    rendered: List[str] = []
+    used = 0
+    for block in blocks:
+        text = block.render(len(kept) + 1)
+        tokens = count_tokens(text, encoding_name) + (2 if rendered else 0)
+        if budget and used + tokens > budget:
+            if kept:
+                continue
+            text = truncate_to_tokens(text, budget, encoding_name)
+            tokens = count_tokens(text, encoding_name)
+        kept.append(block)
+        rendered.append(text)
+        used += tokens
+
+    packed = PackedContext(kept, "\n\n".join(rendered), raw_tokens, used, len(blocks) - len(kept))
+    print(
+        f"📐 Packed {len(points)} chunks into {len(kept)} blocks: {packed.tokens} tokens "
+        f"(saved {packed.saved_tokens} of {packed.raw_tokens}, {packed.dropped_blocks} blocks over budget)"
+    )
+    return packed
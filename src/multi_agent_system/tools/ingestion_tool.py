@@ -0,0 +1,294 @@
+import os
+import sys
+import hashlib
+import threading
+
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.tools.manifest import load_manifest, save_manifest, delete_manifest
+from src.multi_agent_system.tools.bm25_index import BM25Index, get_bm25_index_path
+from src.multi_agent_system.tools.parallel_parsing import iter_parsed_files
+from src.multi_agent_system.tools.vector_store import estimate_points, choose_backend, open_vector_store
+from src.multi_agent_system.tools.rag_tool import (
+    COLLECTION_NAME,
+    INPUT_FILES_PATH,
+    VECTOR_SIZE,
+    iter_split_documents,
+    iter_batches,
+    recreate_collection_for_rag,
+    chunk_point_id,
+    upsert_chunks,
+)
+
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchValue,
+    PointIdsList,
+    SetPayload,
+    SetPayloadOperation,
+)
+
+# una sola ingestion alla volta: più sessioni Streamlit possono inviare il form insieme
+_ingestion_lock = threading.Lock()
+
+def hash_file(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def needs_full_rebuild(manifest: Optional[dict], settings: Settings, client: QdrantClient, collection_name: str, backend: str) -> bool:
+    """
+    The incremental sync is only valid if the collection was built with the same splitting
+    parameters and the same embedding model: otherwise every chunk id and vector is stale.
+    A collection that moves to another vector backend is rebuilt in the new one.
+    """
+    if manifest is None or manifest.get("backend", "qdrant") != backend or not client.collection_exists(collection_name):
+        return True
+    if not os.path.exists(get_bm25_index_path(collection_name)):
+        return True
+    return (
+        manifest.get("chunk_size") != settings.chunk_size
+        or manifest.get("chunk_overlap") != settings.chunk_overlap
+        or manifest.get("vector_size") != VECTOR_SIZE
+        or manifest.get("embedding_deployment") != os.getenv("AZURE_EMBEDDING_DEPLOYMENT_NAME")
+    )
+
+def source_filter(source: str, keep_doc_id: Optional[str] = None) -> Filter:
+    # usa gli indici keyword 'source' / 'doc_id' creati in recreate_collection_for_rag
+    must_not = [FieldCondition(key="doc_id", match=MatchValue(value=keep_doc_id))] if keep_doc_id else None
+    return Filter(
+        must=[FieldCondition(key="source", match=MatchValue(value=source))],
+        must_not=must_not,
+    )
+
+class FileSync:
+    """
+    Bookkeeping of one new or modified file during the streaming sync.
+    Only point ids are kept here, never the chunks: memory does not grow with the file size.
+    """
+
+    def __init__(self, filename: str, file_hash: str, old: Optional[dict]):
+        self.filename = filename
+        self.file_path = os.path.join(INPUT_FILES_PATH, filename)
+        self.file_hash = file_hash
+        self.old = old
+        self.old_ids = set(old["point_ids"]) if old else set()
+        # tutti i chunk del file in ordine; i nuovi vanno all'embedding, quelli invariati (id, chunk_id) solo al payload
+        self.point_ids: List[str] = []
+        self.new_ids: List[str] = []
+        self.kept: List[Tuple[str, int]] = []
+        self.failed = False
+
+def iter_file_chunks(sync: FileSync, docs: Optional[Iterator[Document]], settings: Settings) -> Iterator[Document]:
+    """
+    Streams the chunks of a file (page by page for PDFs) tagged with their deterministic point id,
+    the file hash (doc_id) and their position in the file (chunk_id). Identical chunks of the same file are kept once.
+    A file that cannot be loaded or parsed is marked as failed (the chunks already produced are rolled back by the caller).
+    """
+    if docs is None:
+        print(f"❌ Unsupported file format: {sync.filename}")
+        sync.failed = True
+        return
+
+    seen_ids = set()
+    try:
+        for chunk in iter_split_documents(docs, settings):
+            point_id = chunk_point_id(chunk.metadata.get("source"), chunk.page_content)
+            if point_id in seen_ids:
+                continue
+            seen_ids.add(point_id)
+            chunk.metadata["point_id"] = point_id
+            chunk.metadata["doc_id"] = sync.file_hash
+            chunk.metadata["chunk_id"] = len(sync.point_ids)
+            sync.point_ids.append(point_id)
+            yield chunk
+        print(f"📄 Loaded {sync.filename} with {len(sync.point_ids)} chunks.")
+    except Exception as e:
+        print(f"⚠️ Error loading {sync.filename}: {e}")
+        sync.failed = True
+
+def iter_new_chunks(syncs: List[FileSync], lexical_index: BM25Index, settings: Settings) -> Iterator[Document]:
+    """
+    Ingestion pipeline as a chain of generators: file discovery -> parsing (PDF page ranges in a
+    process pool, see parallel_parsing) -> splitting. Only the chunks that are not indexed yet are
+    yielded, to the embedding batches of upsert_chunks, which pull them at their own pace (backpressure):
+    the first batch is embedded while the rest of the corpus has not been parsed yet.
+    """
+    parsed = iter_parsed_files([sync.file_path for sync in syncs], settings.parse_workers, settings.pdf_pages_per_task)
+    for sync, (_, docs) in zip(syncs, parsed):
+        for chunk in iter_file_chunks(sync, docs, settings):
+            point_id = chunk.metadata["point_id"]
+            if point_id in sync.old_ids:
+                sync.kept.append((point_id, chunk.metadata["chunk_id"]))
+                continue
+            sync.new_ids.append(point_id)
+            lexical_index.add(point_id, chunk.page_content)
+            yield chunk
+
+def ingest_documents(settings: Settings, collection_name: str = COLLECTION_NAME, full_rebuild: bool = False) -> dict:
+    """
+    This function synchronizes the vector index used by the RAG pipeline with the files in the input directory.
+    Only new or modified files are parsed, and only their new chunks are embedded and upserted:
+    chunks of modified or deleted files are removed through the 'source'/'doc_id' payload indexes.
+    The BM25 lexical index of the collection is updated with the same chunks.
+    The vector backend (Qdrant or the local store) comes from settings.vector_backend; with "auto"
+    corpora estimated at most settings.local_max_points chunks are kept in the local store.
+    The collection is rebuilt from scratch when it does not exist yet, when the splitting settings
+    or the embedding model changed, or when full_rebuild is True.
+    A manifest of what has been indexed is recorded, so that queries never need to touch the raw files.
+
+    Args:
+        settings (Settings): RAG settings (vector backend, Qdrant url, chunk size and overlap).
+        collection_name (str): Name of the Qdrant collection to synchronize.
+        full_rebuild (bool): Drop and rebuild the whole collection.
+
+    Returns:
+        dict: The manifest of the indexed collection, with the statistics of this sync under 'last_sync'.
+    """
+    with _ingestion_lock:
+        embedding_model = get_embedding_model()
+        backend = choose_backend(settings, estimate_points(INPUT_FILES_PATH, settings))
+        vector_store = open_vector_store(settings, backend)
+
+        manifest = load_manifest(collection_name, with_point_ids=True)
+        if full_rebuild or needs_full_rebuild(manifest, settings, vector_store, collection_name, backend):
+            print(f"🔄 Full rebuild of collection {collection_name} ({backend} backend).")
+            if backend != "local":
+                # manifest e indice BM25 invalidati prima di svuotare la collection: se la rebuild si interrompe,
+                # la sync successiva riparte da zero invece di considerare "invariati" file non più indicizzati.
+                # Lo store locale costruisce invece la nuova versione a parte e la pubblica solo con flush:
+                # fino ad allora manifest, indice e collezione su disco restano coerenti e servono le query
+                delete_manifest(collection_name)
+                if os.path.exists(get_bm25_index_path(collection_name)):
+                    os.remove(get_bm25_index_path(collection_name))
+            recreate_collection_for_rag(vector_store, collection_name, VECTOR_SIZE)
+            lexical_index = BM25Index()
+            old_files = {}
+        else:
+            # copia privata: l'indice condiviso dalle query non viene modificato durante la sync
+            lexical_index = BM25Index.load(get_bm25_index_path(collection_name))
+            old_files = manifest.get("files", {})
+
+        stats = {"added": 0, "modified": 0, "deleted": 0, "unchanged": 0, "upserted_chunks": 0, "deleted_files_chunks": 0}
+        files = {}
+        syncs: List[FileSync] = []
+
+        for filename in sorted(os.listdir(INPUT_FILES_PATH)):
+            file_hash = hash_file(os.path.join(INPUT_FILES_PATH, filename))
+            old = old_files.get(filename)
+
+            if old and old["sha256"] == file_hash:
+                files[filename] = old
+                stats["unchanged"] += 1
+                continue
+            syncs.append(FileSync(filename, file_hash, old))
+
+        # un'unica pipeline per tutti i file nuovi o modificati: in memoria solo i batch in volo
+        upsert_chunks(vector_store, collection_name, iter_new_chunks(syncs, lexical_index, settings), embedding_model, settings)
+
+        # al ritorno di upsert_chunks tutti i nuovi punti sono scritti: si completa la sync file per file
+        for sync in syncs:
+            if sync.failed:
+                # file non supportato o non leggibile: si annullano i chunk già caricati e si mantiene quanto già indicizzato
+                if sync.new_ids:
+                    vector_store.delete(
+                        collection_name=collection_name,
+                        points_selector=PointIdsList(points=sync.new_ids),
+                        wait=True,
+                    )
+                    for point_id in sync.new_ids:
+                        lexical_index.remove(point_id)
+                if sync.old:
+                    files[sync.filename] = sync.old
+                continue
+
+            for batch in iter_batches(sync.kept, settings.upsert_batch_size):
+                # chunk invariati: nessun nuovo embedding, si aggiornano solo doc_id e posizione
+                vector_store.batch_update_points(
+                    collection_name=collection_name,
+                    update_operations=[
+                        SetPayloadOperation(set_payload=SetPayload(
+                            payload={"doc_id": sync.file_hash, "chunk_id": chunk_id},
+                            points=[point_id],
+                        ))
+                        for point_id, chunk_id in batch
+                    ],
+                    wait=True,
+                )
+            stats["upserted_chunks"] += len(sync.new_ids)
+            if sync.old:
+                for point_id in sync.old_ids.difference(sync.point_ids):
+                    lexical_index.remove(point_id)
+                # rimuove i chunk della versione precedente che non esistono più
+                vector_store.delete(
+                    collection_name=collection_name,
+                    points_selector=FilterSelector(filter=source_filter(sync.file_path, keep_doc_id=sync.file_hash)),
+                    wait=True,
+                )
+                stats["modified"] += 1
+            else:
+                stats["added"] += 1
+
+            files[sync.filename] = {
+                "sha256": sync.file_hash,
+                "num_chunks": len(sync.point_ids),
+                "point_ids": sync.point_ids,
+            }
+
+        for filename in old_files.keys() - files.keys():
+            vector_store.delete(
+                collection_name=collection_name,
+                points_selector=FilterSelector(filter=source_filter(os.path.join(INPUT_FILES_PATH, filename))),
+                wait=True,
+            )
+            for point_id in old_files[filename]["point_ids"]:
+                lexical_index.remove(point_id)
+            stats["deleted"] += 1
+            stats["deleted_files_chunks"] += old_files[filename]["num_chunks"]
+
+        if backend == "local":
+            vector_store.flush(collection_name)
+        lexical_index.save(get_bm25_index_path(collection_name))
+
+        print(f"📦 Synced collection {collection_name}: {stats}")
+
+        manifest = {
+            "collection_name": collection_name,
+            "backend": backend,
+            "vector_size": VECTOR_SIZE,
+            "embedding_deployment": os.getenv("AZURE_EMBEDDING_DEPLOYMENT_NAME"),
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+            "num_files": len(files),
+            "num_chunks": sum(f["num_chunks"] for f in files.values()),
+            "files": files,
+            "last_sync": stats,
+        }
+        return save_manifest(collection_name, manifest)
+
+def start_ingestion_job(settings: Settings, collection_name: str = COLLECTION_NAME) -> threading.Thread:
+    """Runs ingest_documents in a background thread and returns the started thread."""
+    def job():
+        try:
+            ingest_documents(settings, collection_name)
+        except Exception as e:
+            print(f"⚠️ Error during background ingestion: {e}")
+
+    thread = threading.Thread(target=job, name=f"ingestion-{collection_name}", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    # uso come job schedulato, dalla cartella app/: PYTHONPATH=.. python -m src.multi_agent_system.tools.ingestion_tool [config_path] [--full]
+    args = [a for a in sys.argv[1:] if a != "--full"]
+    config_path = args[0] if args else "../src/multi_agent_system/config/rag_config.json"
+    ingest_documents(Settings(config_path), full_rebuild="--full" in sys.argv)
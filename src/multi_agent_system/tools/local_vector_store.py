@@ -0,0 +1,340 @@
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from qdrant_client.http.models import QueryResponse
+from qdrant_client.models import (
+    CountResult,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchText,
+    MatchValue,
+    PointIdsList,
+    PointStruct,
+    Record,
+    ScoredPoint,
+    SetPayloadOperation,
+)
+
+from src.multi_agent_system.tools.query_context import tokenize
+
+LOCAL_STORE_PATH = "../data/local_store/"
+# file della cartella di una collezione con il nome della versione corrente (sottocartella con vettori e payload)
+CURRENT_FILE = "CURRENT"
+
+def current_version_path(collection_path: str) -> Optional[str]:
+    """Directory of the current version of a collection, or None if it has never been written."""
+    try:
+        with open(os.path.join(collection_path, CURRENT_FILE), "r") as f:
+            return os.path.join(collection_path, f.read().strip())
+    except FileNotFoundError:
+        # collezioni scritte prima delle versioni: vettori e payload direttamente nella cartella
+        return collection_path if os.path.exists(os.path.join(collection_path, "payloads.json")) else None
+
+class LocalCollection:
+    """
+    One collection of the local store: normalized vectors (float32 or float16) in a memory-mapped
+    .npy file plus the ids and payloads in a JSON file.
+    Mutations happen in memory and are written to disk by save().
+    """
+
+    def __init__(self, vector_size: int, dtype: str = "float32"):
+        self.vector_size = vector_size
+        self.dtype = np.dtype(dtype)
+        self.ids: List[Any] = []
+        self.payloads: List[dict] = []
+        self.vectors = np.empty((0, vector_size), dtype=self.dtype)
+        # matrice con righe libere in fondo: vectors ne è la parte occupata
+        self._buffer = self.vectors
+        self.row: Dict[Any, int] = {}
+        self._tokens: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _writable(self):
+        # il file mappato è in sola lettura: la prima modifica lavora su una copia in memoria
+        if isinstance(self.vectors, np.memmap):
+            self.vectors = np.array(self.vectors)
+            self._buffer = self.vectors
+
+    def _append(self, rows: np.ndarray):
+        # capacità che cresce in modo geometrico: ingerire N punti copia ogni riga un numero costante di volte
+        # (ammortizzato), invece di ricopiare l'intera matrice a ogni batch
+        size = len(self.vectors)
+        needed = size + len(rows)
+        if needed > len(self._buffer):
+            buffer = np.empty((max(needed, len(self._buffer) * 3 // 2), self.vector_size), dtype=self.dtype)
+            buffer[:size] = self.vectors
+            self._buffer = buffer
+        self._buffer[size:needed] = rows
+        self.vectors = self._buffer[:needed]
+
+    def upsert(self, points: List[PointStruct]):
+        self._writable()
+        base = len(self.ids)
+        new_rows = []
+        for p in points:
+            vec = np.asarray(p.vector, dtype=np.float32)
+            vec = (vec / (np.linalg.norm(vec) + 1e-12)).astype(self.dtype)
+            if p.id in self.row:
+                row = self.row[p.id]
+                if row < base:
+                    self.vectors[row] = vec
+                else:
+                    new_rows[row - base] = vec
+                self.payloads[row] = p.payload or {}
+                self._tokens.pop(row, None)
+            else:
+                self.row[p.id] = base + len(new_rows)
+                new_rows.append(vec)
+                self.ids.append(p.id)
+                self.payloads.append(p.payload or {})
+        if new_rows:
+            self._append(np.stack(new_rows))
+
+    def delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+        self._writable()
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self.vectors = self.vectors[keep]
+        self._buffer = self.vectors
+        self.ids = [pid for pid, k in zip(self.ids, keep) if k]
+        self.payloads = [pay for pay, k in zip(self.payloads, keep) if k]
+        self.row = {pid: i for i, pid in enumerate(self.ids)}
+        self._tokens = {}
+
+    def tokens(self, row: int) -> Set[str]:
+        if row not in self._tokens:
+            self._tokens[row] = set(tokenize(self.payloads[row].get("text") or ""))
+        return self._tokens[row]
+
+    def matches(self, row: int, flt: Optional[Filter]) -> bool:
+        """Evaluates the subset of Qdrant filters used by the RAG code (MatchValue / MatchText, must / must_not)."""
+        if flt is None:
+            return True
+
+        def condition(cond: FieldCondition) -> bool:
+            value = self.payloads[row].get(cond.key)
+            if isinstance(cond.match, MatchValue):
+                return value == cond.match.value
+            if isinstance(cond.match, MatchText):
+                # come l'indice full-text di Qdrant: tutti i token della query devono comparire nel testo
+                return set(tokenize(cond.match.text)) <= self.tokens(row)
+            raise NotImplementedError(f"Unsupported condition in local store: {cond}")
+
+        return all(condition(c) for c in (flt.must or [])) and not any(condition(c) for c in (flt.must_not or []))
+
+    def search(self, vector: List[float], limit: int) -> List[Tuple[int, float]]:
+        if not self.ids or limit <= 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q = (q / (np.linalg.norm(q) + 1e-12)).astype(self.dtype)
+        # vettori già normalizzati: la similarità coseno è un unico prodotto matrice-vettore
+        scores = self.vectors @ q
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def save(self, collection_path: str):
+        """
+        Writes the collection as a new version directory and then switches the CURRENT pointer to it
+        with one atomic rename: a concurrent reader always loads vectors and payloads of the same version.
+        """
+        previous = current_version_path(collection_path)
+        version = f"v{time.time_ns()}"
+        version_path = os.path.join(collection_path, version)
+        os.makedirs(version_path)
+        np.save(os.path.join(version_path, "vectors.npy"), np.ascontiguousarray(self.vectors))
+        with open(os.path.join(version_path, "payloads.json"), "w") as f:
+            json.dump({"vector_size": self.vector_size, "dtype": self.dtype.name, "ids": self.ids, "payloads": self.payloads}, f)
+
+        tmp_path = os.path.join(collection_path, CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(collection_path, CURRENT_FILE))
+
+        # si tiene anche la versione precedente, che un lettore può aver appena scelto; le più vecchie si eliminano
+        keep = {version, os.path.basename(previous) if previous and previous != collection_path else None}
+        for name in os.listdir(collection_path):
+            if name.startswith("v") and name not in keep and os.path.isdir(os.path.join(collection_path, name)):
+                shutil.rmtree(os.path.join(collection_path, name), ignore_errors=True)
+
+    @classmethod
+    def load(cls, collection_path: str) -> "LocalCollection":
+        path = current_version_path(collection_path)
+        if path is None:
+            raise FileNotFoundError(f"Local collection not found: {collection_path}")
+        with open(os.path.join(path, "payloads.json"), "r") as f:
+            data = json.load(f)
+        collection = cls(data["vector_size"], data["dtype"])
+        collection.ids = data["ids"]
+        collection.payloads = data["payloads"]
+        collection.row = {pid: i for i, pid in enumerate(collection.ids)}
+        collection.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        collection._buffer = collection.vectors
+        return collection
+
+class LocalVectorStore:
+    """
+    In-process vector store for small corpora and Qdrant-free runs.
+    It implements the subset of the QdrantClient API used by the RAG pipeline (see vector_store.py),
+    so ingestion and hybrid_search run unchanged on top of it. Search is exact: one matrix product
+    over the normalized vectors and an argpartition for the top-k.
+    """
+
+    def __init__(self, path: str = LOCAL_STORE_PATH, dtype: str = "float32"):
+        self.path = path
+        self.dtype = dtype
+        self._collections: Dict[str, LocalCollection] = {}
+
+    def _collection_path(self, collection_name: str) -> str:
+        return os.path.join(self.path, collection_name)
+
+    def _get(self, collection_name: str) -> LocalCollection:
+        if collection_name not in self._collections:
+            self._collections[collection_name] = LocalCollection.load(self._collection_path(collection_name))
+        return self._collections[collection_name]
+
+    def flush(self, collection_name: str):
+        """Writes the collection to disk (the other methods only modify it in memory)."""
+        # una collezione mai caricata non è stata modificata
+        if collection_name in self._collections:
+            self._collections[collection_name].save(self._collection_path(collection_name))
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return collection_name in self._collections or current_version_path(self._collection_path(collection_name)) is not None
+
+    def recreate_collection(self, collection_name: str, vectors_config, **kwargs):
+        # la nuova collezione vive solo in memoria fino a flush: le query continuano a leggere la versione su disco
+        self._collections[collection_name] = LocalCollection(vectors_config.size, self.dtype)
+
+    def delete_collection(self, collection_name: str, **kwargs):
+        shutil.rmtree(self._collection_path(collection_name), ignore_errors=True)
+        self._collections.pop(collection_name, None)
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema, **kwargs):
+        # nessun indice: i filtri sono valutati per scansione, sufficiente per corpus piccoli
+        pass
+
+    def upsert(self, collection_name: str, points: List[PointStruct], wait: bool = True, **kwargs):
+        self._get(collection_name).upsert(list(points))
+
+    def upload_points(self, collection_name: str, points: Iterable[PointStruct], batch_size: int = 64, **kwargs):
+        collection = self._get(collection_name)
+        batch = []
+        for point in points:
+            batch.append(point)
+            if len(batch) >= batch_size:
+                collection.upsert(batch)
+                batch = []
+        if batch:
+            collection.upsert(batch)
+
+    def batch_update_points(self, collection_name: str, update_operations: List[Any], wait: bool = True, **kwargs):
+        collection = self._get(collection_name)
+        for op in update_operations:
+            if not isinstance(op, SetPayloadOperation):
+                raise NotImplementedError(f"Unsupported update operation in local store: {type(op).__name__}")
+            for pid in op.set_payload.points:
+                if pid in collection.row:
+                    collection.payloads[collection.row[pid]].update(op.set_payload.payload)
+
+    def delete(self, collection_name: str, points_selector: Union[FilterSelector, PointIdsList], wait: bool = True, **kwargs):
+        collection = self._get(collection_name)
+        if isinstance(points_selector, PointIdsList):
+            collection.delete_rows([collection.row[pid] for pid in points_selector.points if pid in collection.row])
+            return
+        collection.delete_rows([row for row in range(len(collection)) if collection.matches(row, points_selector.filter)])
+
+    def count(self, collection_name: str, **kwargs) -> CountResult:
+        return CountResult(count=len(self._get(collection_name)))
+
+    def _record(self, collection: LocalCollection, row: int, with_payload: bool, with_vectors: bool) -> dict:
+        return dict(
+            id=collection.ids[row],
+            payload=collection.payloads[row] if with_payload else None,
+            vector=collection.vectors[row].astype(np.float32).tolist() if with_vectors else None,
+        )
+
+    def query_points(
+        self,
+        collection_name: str,
+        query: List[float],
+        limit: int = 10,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        **kwargs
+    ) -> QueryResponse:
+        if kwargs.get("prefetch"):
+            raise NotImplementedError("Server-side fusion (prefetch) is not available in the local store")
+        collection = self._get(collection_name)
+        return QueryResponse(points=[
+            ScoredPoint(version=0, score=score, **self._record(collection, row, with_payload, with_vectors))
+            for row, score in collection.search(query, limit)
+        ])
+
+    def scroll(
+        self,
+        collection_name: str,
+        scroll_filter: Optional[Filter] = None,
+        limit: int = 10,
+        offset: Optional[int] = None,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        **kwargs
+    ) -> Tuple[List[Record], Optional[int]]:
+        collection = self._get(collection_name)
+        records = []
+        row = offset or 0
+        while row < len(collection) and len(records) < limit:
+            if collection.matches(row, scroll_filter):
+                records.append(Record(**self._record(collection, row, with_payload, with_vectors)))
+            row += 1
+        return records, (row if row < len(collection) else None)
+
+    def retrieve(self, collection_name: str, ids: List[Any], with_payload: bool = True, with_vectors: bool = False, **kwargs) -> List[Record]:
+        collection = self._get(collection_name)
+        return [
+            Record(**self._record(collection, collection.row[pid], with_payload, with_vectors))
+            for pid in ids if pid in collection.row
+        ]
+
+class AsyncLocalVectorStore:
+    """Async facade of LocalVectorStore for the async retrieval path (the work is in-process and fast)."""
+
+    def __init__(self, store: LocalVectorStore):
+        self._store = store
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._store, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+_loaded: Dict[Tuple[str, str], Tuple[Optional[str], LocalVectorStore]] = {}
+_loaded_lock = threading.Lock()
+
+def get_local_vector_store(collection_name: str, path: str = LOCAL_STORE_PATH) -> LocalVectorStore:
+    """
+    Read-only local store shared by the queries of the process, reloaded (memory-mapped)
+    only when the ingestion has written a new version of the collection.
+    """
+    version_path = current_version_path(os.path.join(path, collection_name))
+    # ogni flush scrive una nuova cartella di versione: basta confrontarne il percorso
+    with _loaded_lock:
+        cached = _loaded.get((path, collection_name))
+        if cached is None or cached[0] != version_path:
+            cached = (version_path, LocalVectorStore(path))
+            _loaded[(path, collection_name)] = cached
+        return cached[1]
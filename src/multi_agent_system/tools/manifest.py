@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import threading
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+MANIFESTS_PATH = "../data/manifests/"
+
+def get_manifest_path(collection_name: str) -> str:
+    return os.path.join(MANIFESTS_PATH, f"{collection_name}.json")
+
+def get_point_ids_path(collection_name: str) -> str:
+    # id dei chunk di ogni file: servono solo all'ingestion, e crescono con il corpus
+    return os.path.join(MANIFESTS_PATH, f"{collection_name}_point_ids.json")
+
+def _read_json(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Error reading manifest {path}: {e}")
+        return None
+
+def _write_json(path: str, data: dict, indent: Optional[int] = None):
+    # scrittura atomica: un lettore concorrente vede sempre un file completo
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+def load_manifest(collection_name: str, with_point_ids: bool = False) -> Optional[dict]:
+    """
+    Returns the manifest written by the last ingestion of the given collection,
+    or None if the collection has never been indexed.
+    With with_point_ids (ingestion only) every file entry also gets its 'point_ids':
+    if they are missing the manifest is not usable for an incremental sync and None is returned.
+    """
+    manifest = _read_json(get_manifest_path(collection_name))
+    if manifest is None or not with_point_ids:
+        return manifest
+
+    point_ids: Dict[str, List[str]] = _read_json(get_point_ids_path(collection_name)) or {}
+    files = {}
+    for filename, f in manifest.get("files", {}).items():
+        # i manifest precedenti tenevano gli id nelle voci dei file
+        ids = point_ids.get(filename, f.get("point_ids"))
+        if ids is None:
+            print(f"⚠️ Point ids of {collection_name} not found: the manifest cannot be used for an incremental sync.")
+            return None
+        files[filename] = dict(f, point_ids=ids)
+    manifest["files"] = files
+    return manifest
+
+_loaded: Dict[str, Tuple[float, dict]] = {}
+_loaded_lock = threading.Lock()
+
+def get_manifest(collection_name: str) -> Optional[dict]:
+    """
+    Read-only manifest of a collection, shared by the queries of the process (do not modify it).
+    It is reloaded from disk only when the ingestion has written a new version.
+    """
+    path = get_manifest_path(collection_name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _loaded_lock:
+        cached = _loaded.get(collection_name)
+        if cached is None or cached[0] != mtime:
+            manifest = _read_json(path)
+            if manifest is None:
+                return None
+            cached = (mtime, manifest)
+            _loaded[collection_name] = cached
+        return cached[1]
+
+def save_manifest(collection_name: str, manifest: dict) -> dict:
+    """
+    Records the manifest of a completed sync. The 'point_ids' of the file entries go to a separate file,
+    written first: the manifest, small and read by the queries, is the commit point of the sync.
+    """
+    os.makedirs(MANIFESTS_PATH, exist_ok=True)
+    point_ids = {filename: f["point_ids"] for filename, f in manifest.get("files", {}).items()}
+    _write_json(get_point_ids_path(collection_name), point_ids)
+
+    manifest = dict(manifest)
+    manifest["files"] = {
+        filename: {key: value for key, value in f.items() if key != "point_ids"}
+        for filename, f in manifest.get("files", {}).items()
+    }
+    manifest["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    _write_json(get_manifest_path(collection_name), manifest, indent=4)
+    return manifest
+
+def delete_manifest(collection_name: str):
+    """Invalidates the manifest of a collection, e.g. before a full rebuild: the next sync starts from scratch."""
+    for path in (get_manifest_path(collection_name), get_point_ids_path(collection_name)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def corpus_version(collection_name: str) -> str:
+    """
+    Fingerprint of the indexed documents (file hashes and indexing parameters) of a collection:
+    it changes only when the ingestion actually changes the collection.
+    """
+    manifest = get_manifest(collection_name)
+    if manifest is None:
+        return "empty"
+    indexed = {
+        key: manifest.get(key)
+        for key in ("backend", "vector_size", "embedding_deployment", "chunk_size", "chunk_overlap")
+    }
+    indexed["files"] = {filename: f["sha256"] for filename, f in manifest.get("files", {}).items()}
+    return hashlib.sha256(json.dumps(indexed, sort_keys=True).encode("utf-8")).hexdigest()
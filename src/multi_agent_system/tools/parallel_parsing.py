@@ -0,0 +1,186 @@
+import io
+import os
+import multiprocessing
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import groupby
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+from langchain_community.document_loaders import TextLoader, CSVLoader, PyPDFLoader
+from langchain_core.documents.base import Blob
+
+# modulo leggero: i processi worker (avviati con "spawn") importano solo i loader, non il resto dell'app
+
+SUPPORTED_EXTENSIONS = (".txt", ".csv", ".pdf")
+
+def loader_for_path(path: str) -> Optional[BaseLoader]:
+    """Loader of a supported input file (txt, csv, pdf), or None for the other formats."""
+    if path.endswith(".txt"):
+        return TextLoader(path, encoding="utf-8")
+    elif path.endswith(".csv"):
+        return CSVLoader(path)
+    elif path.endswith(".pdf"):
+        return PyPDFLoader(path)
+    return None
+
+class ParseTask:
+    """A file, or the page range [start_page, end_page) of a PDF, parsed as one unit of work."""
+
+    def __init__(self, path: str, start_page: Optional[int] = None, end_page: Optional[int] = None):
+        self.path = path
+        self.start_page = start_page
+        self.end_page = end_page
+
+    @property
+    def in_pool(self) -> bool:
+        # solo il parsing dei PDF è CPU-bound: txt e csv costano meno del trasferimento dei documenti tra processi
+        return self.path.endswith(".pdf")
+
+def count_pdf_pages(path: str) -> Optional[int]:
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(path).pages)
+    except Exception:
+        # PDF non leggibile: un solo task, che fallisce nel worker con l'errore del loader
+        return None
+
+def plan_parse_tasks(paths: List[str], pdf_pages_per_task: int) -> List[ParseTask]:
+    """Tasks in input order: one per file, large PDFs split into consecutive page ranges."""
+    tasks = []
+    for path in paths:
+        n_pages = count_pdf_pages(path) if path.endswith(".pdf") else None
+        if not n_pages or n_pages <= pdf_pages_per_task:
+            tasks.append(ParseTask(path))
+            continue
+        for start in range(0, n_pages, pdf_pages_per_task):
+            tasks.append(ParseTask(path, start, min(start + pdf_pages_per_task, n_pages)))
+    return tasks
+
+def parse_pdf_pages(path: str, start_page: int, end_page: int) -> List[Document]:
+    """
+    Pages [start_page, end_page) of a PDF, with the same content and metadata as PyPDFLoader.lazy_load:
+    the pages are copied into an in-memory PDF parsed by the loader's own parser (PyPDFParser.lazy_parse),
+    then page numbers, labels and page count are taken back from the original file.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    parser = PyPDFLoader(path).parser
+    reader = PdfReader(path, password=parser.password)
+    writer = PdfWriter()
+    for page_number in range(start_page, end_page):
+        writer.add_page(reader.pages[page_number])
+    # stessi metadati del file originale (senza il producer aggiunto da PdfWriter)
+    writer.metadata = None
+    if reader.metadata:
+        writer.add_metadata(dict(reader.metadata))
+    data = io.BytesIO()
+    writer.write(data)
+
+    docs = []
+    for offset, doc in enumerate(parser.lazy_parse(Blob.from_data(data.getvalue(), path=path))):
+        page_number = start_page + offset
+        doc.metadata.update(total_pages=len(reader.pages), page=page_number, page_label=reader.page_labels[page_number])
+        docs.append(doc)
+    return docs
+
+def parse_task(task: ParseTask) -> Tuple[Optional[List[Document]], Optional[str]]:
+    """Worker entry point: (documents, None), or (None, error) so that a bad file never breaks the pool."""
+    try:
+        if task.start_page is not None:
+            return parse_pdf_pages(task.path, task.start_page, task.end_page), None
+        return loader_for_path(task.path).load(), None
+    except Exception as e:
+        return None, str(e)
+
+def resolve_workers(workers: int) -> int:
+    # 0 = un worker per core
+    return workers or os.cpu_count() or 1
+
+def _submit(executor: ProcessPoolExecutor, task: ParseTask) -> Future:
+    try:
+        return executor.submit(parse_task, task)
+    except Exception as e:
+        # pool rotto (es. un worker terminato dal sistema): il task fallisce come un file illeggibile
+        future = Future()
+        future.set_exception(e)
+        return future
+
+def iter_task_results(tasks: List[ParseTask], workers: int) -> Iterator[Tuple[ParseTask, Iterator[Document], Optional[str]]]:
+    """
+    Results of the tasks in input order, whatever order the workers finish in.
+    PDF tasks run in a process pool with at most 2 * workers tasks submitted ahead of the consumer
+    (backpressure: parsed pages do not pile up in memory); the other files are streamed in this
+    process with lazy_load when their turn comes. With workers == 1 no pool is started.
+    A failure of the pool itself is reported as the error of the affected tasks, never raised.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        for task in tasks:
+            if task.in_pool:
+                docs, error = parse_task(task)
+                yield task, iter(docs or []), error
+            else:
+                yield task, loader_for_path(task.path).lazy_load(), None
+        return
+
+    # "spawn": il processo che avvia il pool ha altri thread attivi (Streamlit, loop async), fork non è sicuro
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        window = 2 * workers
+        pending = deque()
+        submitted = 0
+        task_iter = iter(tasks)
+
+        def fill():
+            nonlocal submitted
+            while submitted < window:
+                task = next(task_iter, None)
+                if task is None:
+                    return
+                pending.append((task, _submit(executor, task) if task.in_pool else None))
+                submitted += task.in_pool
+
+        fill()
+        while pending:
+            task, future = pending.popleft()
+            if future is None:
+                yield task, loader_for_path(task.path).lazy_load(), None
+                continue
+            submitted -= 1
+            # il posto liberato va subito a un nuovo task, prima di attendere questo risultato
+            fill()
+            try:
+                docs, error = future.result()
+            except Exception as e:
+                docs, error = None, f"{type(e).__name__}: {e}"
+            yield task, iter(docs or []), error
+
+def _documents(results: Iterator[Tuple[ParseTask, Iterator[Document], Optional[str]]]) -> Iterator[Document]:
+    for task, docs, error in results:
+        if error is not None:
+            raise ValueError(error)
+        yield from docs
+
+def iter_parsed_files(paths: List[str], workers: int = 1, pdf_pages_per_task: int = 50) -> Iterator[Tuple[str, Optional[Iterator[Document]]]]:
+    """
+    Yields (path, documents) for every input path, in input order; documents is None for unsupported formats.
+    Each documents iterator must be consumed (or abandoned) before moving to the next file:
+    a parsing error of any part of a file is raised while iterating its documents, and the
+    remaining parts of that file are skipped, so errors stay isolated per file.
+    """
+    supported = [p for p in paths if p.endswith(SUPPORTED_EXTENSIONS)]
+    workers = resolve_workers(workers)
+    # senza pool gli intervalli di pagine non servono: ogni PDF si legge intero, senza copiarne le pagine
+    tasks = plan_parse_tasks(supported, pdf_pages_per_task) if workers > 1 else [ParseTask(p) for p in supported]
+    results = iter_task_results(tasks, workers)
+    grouped = groupby(results, key=lambda result: result[0].path)
+    next_group = next(grouped, None)
+    for path in paths:
+        if next_group is None or next_group[0] != path:
+            yield path, None
+            continue
+        yield path, _documents(next_group[1])
+        # groupby salta da solo le parti non consumate del file (es. file fallito a metà)
+        next_group = next(grouped, None)
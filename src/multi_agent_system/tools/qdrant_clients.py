@@ -0,0 +1,132 @@
+import time
+import asyncio
+import inspect
+import threading
+import weakref
+
+from collections import defaultdict, deque
+from typing import Any, Dict, Tuple
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from src.multi_agent_system.config.rag_settings import Settings
+
+class QdrantMetrics:
+    """Thread-safe connection and latency counters of the Qdrant clients of the process."""
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def client_created(self):
+        with self._lock:
+            self.clients_created += 1
+
+    def record(self, method: str, elapsed: float, ok: bool):
+        with self._lock:
+            self.calls[method] += 1
+            self.latencies[method].append(elapsed)
+            if not ok:
+                self.errors[method] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            methods = {}
+            for method, samples in self.latencies.items():
+                ordered = sorted(samples)
+                methods[method] = {
+                    "calls": self.calls[method],
+                    "errors": self.errors[method],
+                    "mean_ms": 1000 * sum(ordered) / len(ordered),
+                    "p50_ms": 1000 * ordered[len(ordered) // 2],
+                    "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                }
+            return {"clients_created": self.clients_created, "methods": methods}
+
+metrics = QdrantMetrics()
+
+class InstrumentedClient:
+    """Proxy of a (sync or async) Qdrant client that records the latency of every public method call."""
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                ok = False
+                try:
+                    result = await attr(*args, **kwargs)
+                    ok = True
+                    return result
+                finally:
+                    metrics.record(name, time.perf_counter() - start, ok)
+            return timed_async
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = attr(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                metrics.record(name, time.perf_counter() - start, ok)
+        return timed
+
+def client_key(settings: Settings) -> Tuple:
+    return (settings.qdrant_url, settings.prefer_grpc, settings.grpc_port, settings.qdrant_timeout)
+
+def client_options(settings: Settings) -> dict:
+    return dict(
+        url=settings.qdrant_url,
+        prefer_grpc=settings.prefer_grpc,
+        grpc_port=settings.grpc_port,
+        timeout=settings.qdrant_timeout,
+    )
+
+_clients: Dict[Tuple, InstrumentedClient] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, InstrumentedClient]]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+def get_qdrant_client(settings: Settings) -> QdrantClient:
+    """
+    Long-lived QdrantClient shared by the whole process (and by concurrent Streamlit sessions),
+    one per (url, transport) configuration, so HTTP keep-alive connections or the gRPC channel
+    are reused across queries. Set prefer_grpc in the settings to use the gRPC transport.
+    """
+    key = client_key(settings)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = InstrumentedClient(QdrantClient(**client_options(settings)))
+            _clients[key] = client
+            metrics.client_created()
+        return client
+
+def get_async_qdrant_client(settings: Settings) -> AsyncQdrantClient:
+    """
+    Long-lived AsyncQdrantClient for the running event loop (async connections cannot be
+    shared across loops). With the shared loop of async_runtime there is one per configuration.
+    """
+    loop = asyncio.get_running_loop()
+    key = client_key(settings)
+    with _clients_lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            client = InstrumentedClient(AsyncQdrantClient(**client_options(settings)))
+            loop_clients[key] = client
+            metrics.client_created()
+        return client
+
+def get_qdrant_metrics() -> dict:
+    return metrics.snapshot()
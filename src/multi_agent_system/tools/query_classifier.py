@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import asyncio
+import threading
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.models.embedding_model import get_embedding_model
+
+CLASSIFIER_PATH = "../data/classifier/"
+DECISIONS_PATH = os.path.join(CLASSIFIER_PATH, "decisions.jsonl")
+MODEL_PATH = os.path.join(CLASSIFIER_PATH, "centroids.npz")
+# oltre questa dimensione il log passa a un unico file precedente (decisions.1.jsonl): al massimo due file
+DECISIONS_MAX_BYTES = int(os.getenv("CLASSIFIER_DECISIONS_MAX_BYTES", str(5 * 1024 * 1024)))
+
+TASKS = ("ethics", "medicine")
+# etichette che il pre-classificatore può decidere da solo: un rifiuto etico resta sempre all'LLM,
+# che ne produce anche la motivazione mostrata all'utente
+FAST_PATH_LABELS = {"ethics": {True}, "medicine": {True, False}}
+MIN_EXAMPLES_PER_CLASS = 20
+
+_log_lock = threading.Lock()
+
+def rotated_path(path: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.1{ext}"
+
+def log_decision(task: str, query: str, label: bool, path: str = DECISIONS_PATH, max_bytes: int = DECISIONS_MAX_BYTES):
+    """
+    Appends a decision of the LLM classifiers: the training data of the local pre-classifier.
+    The log contains the raw user queries: callers write it only when settings.log_classifier_decisions is on.
+    When the file reaches max_bytes it replaces the previous rotated file, so the log stays bounded.
+    """
+    line = json.dumps({"task": task, "query": query, "label": bool(label)})
+    with _log_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+            os.replace(path, rotated_path(path))
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+def record_decision(task: str, query: str, label: bool, settings: Settings):
+    """Logs a decision of the LLM classifiers if settings.log_classifier_decisions is on."""
+    if settings.log_classifier_decisions:
+        log_decision(task, query, label)
+
+async def arecord_decision(task: str, query: str, label: bool, settings: Settings):
+    # scrittura su file in un thread: il nodo async non blocca l'event loop condiviso
+    if settings.log_classifier_decisions:
+        await asyncio.to_thread(log_decision, task, query, label)
+
+def load_decisions(path: str = DECISIONS_PATH) -> Dict[str, Dict[str, bool]]:
+    """Logged decisions per task (rotated file first), as {query: label} (the latest decision wins)."""
+    decisions: Dict[str, Dict[str, bool]] = {task: {} for task in TASKS}
+    for log_path in (rotated_path(path), path):
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    decisions[item["task"]][item["query"]] = item["label"]
+    return decisions
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+class CentroidClassifier:
+    """
+    Binary nearest-centroid classifier over normalized query embeddings.
+    The margin of a prediction is the difference between the cosine similarities
+    to the two class centroids: small margins are the uncertain queries.
+    """
+
+    def __init__(self, positive: np.ndarray, negative: np.ndarray, counts: Tuple[int, int]):
+        self.positive = positive
+        self.negative = negative
+        self.counts = counts
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, labels: List[bool]) -> Optional["CentroidClassifier"]:
+        labels = np.asarray(labels, dtype=bool)
+        counts = (int(labels.sum()), int((~labels).sum()))
+        if min(counts) < MIN_EXAMPLES_PER_CLASS:
+            return None
+        vectors = normalize_rows(vectors)
+        return cls(
+            normalize_rows(vectors[labels].mean(axis=0)),
+            normalize_rows(vectors[~labels].mean(axis=0)),
+            counts,
+        )
+
+    def predict(self, vector: List[float]) -> Tuple[bool, float]:
+        v = normalize_rows(vector)
+        diff = float(v @ self.positive - v @ self.negative)
+        return diff > 0, abs(diff)
+
+def save_classifiers(classifiers: Dict[str, CentroidClassifier], path: str = MODEL_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {}
+    for task, clf in classifiers.items():
+        arrays[f"{task}_positive"] = clf.positive
+        arrays[f"{task}_negative"] = clf.negative
+        arrays[f"{task}_counts"] = np.asarray(clf.counts)
+    # np.savez aggiunge ".npz" ai nomi che non lo hanno: il file temporaneo lo mantiene come estensione
+    tmp_path = path[:-len(".npz")] + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+def load_classifiers(path: str = MODEL_PATH) -> Dict[str, CentroidClassifier]:
+    classifiers = {}
+    with np.load(path) as data:
+        for task in TASKS:
+            if f"{task}_positive" in data:
+                classifiers[task] = CentroidClassifier(
+                    data[f"{task}_positive"], data[f"{task}_negative"], tuple(int(c) for c in data[f"{task}_counts"])
+                )
+    return classifiers
+
+def fit_classifiers(embeddings: Embeddings, decisions: Dict[str, Dict[str, bool]]) -> Dict[str, CentroidClassifier]:
+    """Trains one centroid classifier per task; tasks without enough examples of both classes are skipped."""
+    classifiers = {}
+    for task in TASKS:
+        queries = list(decisions.get(task, {}))
+        if not queries:
+            continue
+        vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+        clf = CentroidClassifier.fit(vectors, [decisions[task][q] for q in queries])
+        if clf is None:
+            print(f"⚠️ Not enough logged {task} decisions of both classes (min {MIN_EXAMPLES_PER_CLASS}): task skipped.")
+            continue
+        classifiers[task] = clf
+    return classifiers
+
+def pre_classify(classifiers: Dict[str, CentroidClassifier], query_vector: List[float], margin: float) -> Dict[str, Tuple[bool, float]]:
+    """Local decisions, as {task: (label, margin)}, of the tasks whose prediction is confident enough."""
+    decided = {}
+    for task, clf in classifiers.items():
+        label, confidence = clf.predict(query_vector)
+        if confidence >= margin and label in FAST_PATH_LABELS[task]:
+            decided[task] = (label, confidence)
+    return decided
+
+_loaded: Tuple[float, Dict[str, CentroidClassifier]] = (0.0, {})
+_loaded_lock = threading.Lock()
+
+def get_pre_classifier(path: str = MODEL_PATH) -> Dict[str, CentroidClassifier]:
+    """Trained classifiers (empty if none was trained yet), reloaded when the model file changes."""
+    global _loaded
+    if not os.path.exists(path):
+        return {}
+    mtime = os.path.getmtime(path)
+    with _loaded_lock:
+        if _loaded[0] != mtime:
+            _loaded = (mtime, load_classifiers(path))
+        return _loaded[1]
+
+if __name__ == "__main__":
+    # addestramento dai log delle decisioni, dalla cartella app/: PYTHONPATH=.. python -m src.multi_agent_system.tools.query_classifier [decisions_path]
+    decisions_path = sys.argv[1] if len(sys.argv) > 1 else DECISIONS_PATH
+    trained = fit_classifiers(get_embedding_model(), load_decisions(decisions_path))
+    save_classifiers(trained)
+    for task, clf in trained.items():
+        print(f"✅ {task}: trained on {clf.counts[0]} positive / {clf.counts[1]} negative decisions.")
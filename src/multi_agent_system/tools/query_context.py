@@ -0,0 +1,67 @@
+import re
+import asyncio
+import threading
+
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from qdrant_client.models import FieldCondition, Filter, MatchText
+
+from src.multi_agent_system.config.rag_settings import Settings
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, used for every lexical stage of the retrieval."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class QueryContext:
+    """
+    Per-request retrieval context.
+    It carries the query, the settings and the embedding model through every retrieval stage
+    and computes each derived artifact (query vector, lexical tokens, text filter) at most once,
+    so that semantic search, text prefilter, fusion and MMR all share the same values.
+    """
+
+    def __init__(self, query: str, settings: Settings, embeddings: Embeddings):
+        self.query = query
+        self.settings = settings
+        self.embeddings = embeddings
+        self._vector: Optional[List[float]] = None
+        self._vector_lock = threading.Lock()
+        # embedding async in corso, condiviso dagli stage che chiedono il vettore insieme
+        self._vector_task: Optional[asyncio.Future] = None
+        # score per point id prodotti dagli stage di retrieval, riusabili dagli stage successivi
+        self.semantic_scores: Dict[Any, float] = {}
+        self.lexical_scores: Dict[Any, float] = {}
+        self.fused_scores: Dict[Any, float] = {}
+
+    @property
+    def vector(self) -> List[float]:
+        # un solo embed_query per richiesta, anche se più stage lo chiedono in parallelo
+        with self._vector_lock:
+            if self._vector is None:
+                self._vector = self.embeddings.embed_query(self.query)
+            return self._vector
+
+    async def avector(self) -> List[float]:
+        # stesso valore di vector, con aembed_query: nessun thread del pool di default occupato dall'embedding
+        if self._vector is not None:
+            return self._vector
+        if self._vector_task is None:
+            self._vector_task = asyncio.ensure_future(self.embeddings.aembed_query(self.query))
+        # shield: se uno stage viene cancellato l'embedding resta disponibile per gli altri
+        vector = await asyncio.shield(self._vector_task)
+        with self._vector_lock:
+            if self._vector is None:
+                self._vector = vector
+            return self._vector
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        return tokenize(self.query)
+
+    @cached_property
+    def text_filter(self) -> Filter:
+        return Filter(must=[FieldCondition(key="text", match=MatchText(text=self.query))])
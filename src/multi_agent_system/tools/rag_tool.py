@@ -1,14 +1,24 @@
 import os
+import uuid
+import hashlib
 import numpy as np
 
-from langchain_core.tools import tool
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 from src.multi_agent_system.models.embedding_model import get_embedding_model
-from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.config.rag_settings import Settings, load_settings
+from src.multi_agent_system.tools.manifest import get_manifest
+from src.multi_agent_system.tools.query_context import QueryContext
+from src.multi_agent_system.tools.bm25_index import BM25Index, get_bm25_index
+from src.multi_agent_system.tools.vector_store import get_vector_store, supports_query_api
+from src.multi_agent_system.tools.context_packer import pack_context, indexed_chunk_overlap
+from src.multi_agent_system.tools.parallel_parsing import loader_for_path
 
-from typing import List, Tuple, Any, Iterable
+from typing import List, Tuple, Any, Dict, Iterable, Iterator, Optional
 
-from langchain.schema import Document
-from langchain_community.document_loaders import TextLoader, CSVLoader, PyPDFLoader
+from langchain_core.document_loaders import BaseLoader
 from langchain_openai.embeddings import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
@@ -22,54 +32,67 @@ from qdrant_client.models import (
     ScalarQuantization,
     ScalarQuantizationConfig,
     PayloadSchemaType,
-    FieldCondition,
-    MatchValue,
-    MatchText,
-    Filter,
     SearchParams,
+    QuantizationSearchParams,
+    Prefetch,
+    FusionQuery,
+    Fusion,
     PointStruct,
+    ScoredPoint,
 )
 
+INPUT_FILES_PATH = "../data/input_files/"
+COLLECTION_NAME = "medicine_collection"
+VECTOR_SIZE = 1536
+
+def get_loader(filename: str) -> Optional[BaseLoader]:
+    loader = loader_for_path(os.path.join(INPUT_FILES_PATH, filename))
+    if loader is None:
+        print(f"❌ Unsupported file format: {filename}")
+    return loader
+
+def load_file(filename: str) -> Optional[List[Document]]:
+    """
+    Loads a single file of the input directory.
+    Returns None if the format is not supported or the file cannot be parsed.
+    """
+    try:
+        loader = get_loader(filename)
+        if loader is None:
+            return None
+        loaded_doc = loader.load()
+        print(f"📄 Loaded {filename} with {len(loaded_doc)} documents.")
+        return loaded_doc
+    except Exception as e:
+        print(f"⚠️ Error loading {filename}: {e}")
+        return None
+
 def load_documents() -> List[Document]:
     docs = []
-    input_files_path = "../data/input_files/"
 
-    for filename in os.listdir(input_files_path):
+    for filename in os.listdir(INPUT_FILES_PATH):
         print(filename)
-        complete_file_path = os.path.join(input_files_path, filename)
-
-        if filename.endswith(".txt"):
-            loader = TextLoader(complete_file_path, encoding="utf-8")
-        
-        elif filename.endswith(".csv"):
-            loader = CSVLoader(complete_file_path)
-        
-        elif filename.endswith(".pdf"):
-            loader = PyPDFLoader(complete_file_path)
-        
-        else:
-            print(f"❌ Unsupported file format: {filename}")
-            continue
-        
-        try:
-            loaded_doc = loader.load()
+        loaded_doc = load_file(filename)
+        if loaded_doc is not None:
             docs.extend(loaded_doc)
-            print(len(docs), f"📄 Loaded {filename} with {len(loaded_doc)} documents.")
-        except Exception as e:
-            print(f"⚠️ Error loading {filename}: {e}")
         
     return docs
 
-def get_qdrant_client(settings: Settings) -> QdrantClient:
-    return QdrantClient(url=settings.qdrant_url)
-
-def split_documents(docs: List[Document], settings: Settings) -> List[Document]:
-    splitter = RecursiveCharacterTextSplitter(
+def get_splitter(settings: Settings) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=settings.chunk_size,
         chunk_overlap=settings.chunk_overlap,
         separators=["\n\n", "\n", ". ", "? ", "! ", "; ", ": ", ", ", " ", ""],
     )
-    return splitter.split_documents(docs)
+
+def split_documents(docs: List[Document], settings: Settings) -> List[Document]:
+    return get_splitter(settings).split_documents(docs)
+
+def iter_split_documents(docs: Iterable[Document], settings: Settings) -> Iterator[Document]:
+    """Streaming variant of split_documents: each document is split as soon as it is loaded (same chunks)."""
+    splitter = get_splitter(settings)
+    for doc in docs:
+        yield from splitter.split_documents([doc])
 
 def recreate_collection_for_rag(client: QdrantClient, collection_name: str, vector_size: int):
     
@@ -103,37 +126,99 @@ def recreate_collection_for_rag(client: QdrantClient, collection_name: str, vect
             field_schema=PayloadSchemaType.KEYWORD
         )
 
+def chunk_point_id(source: str, text: str) -> str:
+    """
+    Deterministic point id of a chunk, derived from its source and the hash of its content:
+    the same chunk of the same file always maps to the same Qdrant point.
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{content_hash}"))
+
 def build_points(chunks: List[Document], embeds: List[List[float]]) -> List[PointStruct]:
     pts: List[PointStruct] = []
-    for i, (doc, vec) in enumerate(zip(chunks, embeds), start=1):
+    for i, (doc, vec) in enumerate(zip(chunks, embeds)):
         payload = {
-            "doc_id": doc.metadata.get("id"),
+            "doc_id": doc.metadata.get("doc_id", doc.metadata.get("id")),
             "source": doc.metadata.get("source"),
             "title": doc.metadata.get("title"),
             "lang": doc.metadata.get("lang", "en"),
             "text": doc.page_content,
-            "chunk_id": i - 1
+            "chunk_id": doc.metadata.get("chunk_id", i)
         }
-        pts.append(PointStruct(id=i, vector=vec, payload=payload))
+        point_id = chunk_point_id(payload["source"], doc.page_content)
+        pts.append(PointStruct(id=point_id, vector=vec, payload=payload))
     return pts
 
-def upsert_chunks(client: QdrantClient, collection_name: str, chunks: List[Document], embeddings: OpenAIEmbeddings):
-    vecs = embeddings.embed_documents([c.page_content for c in chunks])
-    points = build_points(chunks, vecs)
-    client.upsert(collection_name=collection_name, points=points, wait=True)
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
 
-def qdrant_semantic_search(
+def upsert_chunks(
     client: QdrantClient,
     collection_name: str,
-    query: str,
+    chunks: Iterable[Document],
     embeddings: OpenAIEmbeddings,
+    settings: Settings
+) -> int:
+    """
+    Embeds and upserts chunks as a pipeline: chunks are embedded in batches of settings.embed_batch_size
+    with at most settings.embed_concurrency requests in flight, and finished batches are streamed
+    into a parallel upload_points. Only a bounded number of batches is held in memory.
+    Every upload batch waits until it is applied on all the shards of the collection (wait=True),
+    so all the points are searchable on return, also on sharded or distributed collections.
+
+    Returns:
+        int: Number of upserted points.
+    """
+    uploaded = 0
+
+    def embed_batch(batch: List[Document]) -> List[PointStruct]:
+        vecs = embeddings.embed_documents([c.page_content for c in batch])
+        return build_points(batch, vecs)
+
+    def embedded_points() -> Iterator[PointStruct]:
+        nonlocal uploaded
+        with ThreadPoolExecutor(max_workers=settings.embed_concurrency) as executor:
+            pending = deque()
+
+            def drain_one():
+                nonlocal uploaded
+                # i batch escono nell'ordine di sottomissione
+                for point in pending.popleft().result():
+                    uploaded += 1
+                    yield point
+
+            for batch in iter_batches(chunks, settings.embed_batch_size):
+                pending.append(executor.submit(embed_batch, batch))
+                # backpressure: non si leggono altri chunk finché le richieste in volo sono al massimo
+                if len(pending) >= settings.embed_concurrency:
+                    yield from drain_one()
+            while pending:
+                yield from drain_one()
+
+    client.upload_points(
+        collection_name=collection_name,
+        points=embedded_points(),
+        batch_size=settings.upsert_batch_size,
+        parallel=settings.upsert_parallel,
+        # un upsert con wait=True attende solo gli shard dei suoi punti: con wait su ogni batch, al ritorno
+        # tutti i punti sono scritti prima che la sync cancelli le versioni precedenti e scriva il manifest;
+        # il throughput resta affidato ai worker paralleli di upload_points e alla pipeline di embedding
+        wait=True,
+    )
+    return uploaded
+
+def qdrant_semantic_search(
+    client: QdrantClient,
+    collection_name: str,
+    ctx: QueryContext,
     limit: int,
     with_vectors: bool = False
 ):
-    qv = embeddings.embed_query(query)
     res = client.query_points(
         collection_name=collection_name,
-        query=qv,
+        query=ctx.vector,
         limit=limit,
         with_payload=True,
         with_vectors=with_vectors,
@@ -147,19 +232,17 @@ def qdrant_semantic_search(
 def qdrant_text_prefilter_ids(
     client: QdrantClient,
     collection_name: str,
-    query: str,
+    ctx: QueryContext,
     max_hits: int
-) -> List[int]:
+) -> List[str]:
     # Scroll con filtro MatchText per ottenere id dei match testuali
     # (nota: scroll è paginato; qui prendiamo solo i primi max_hits per semplicità)
-    matched_ids: List[int] = []
+    matched_ids: List[str] = []
     next_page = None
     while True:
         points, next_page = client.scroll(
             collection_name=collection_name,
-            scroll_filter=Filter(
-                must=[FieldCondition(key="text", match=MatchText(text=query))]
-            ),
+            scroll_filter=ctx.text_filter,
             limit=min(256, max_hits - len(matched_ids)),
             offset=next_page,
             with_payload=False,
@@ -177,131 +260,376 @@ def mmr_select(
     lambda_mult: float
 ) -> List[int]:
     
-    V = np.array(candidates_vecs, dtype=float)
-    q = np.array(query_vec, dtype=float)
+    V = np.asarray(candidates_vecs, dtype=float)
+    q = np.asarray(query_vec, dtype=float)
+    if len(V) == 0:
+        return []
 
-    def cos(a, b):
-        na = (a @ a) ** 0.5 + 1e-12
-        nb = (b @ b) ** 0.5 + 1e-12
-        return float((a @ b) / (na * nb))
+    # normalizzazione una sola volta: da qui in poi ogni similarità coseno è un prodotto scalare
+    V = V / (np.linalg.norm(V, axis=1, keepdims=True) + 1e-12)
+    q = q / (np.linalg.norm(q) + 1e-12)
 
-    sims = [cos(v, q) for v in V]
+    sims = V @ q                             # similarità con la query, un solo prodotto matrice-vettore
+    max_div = np.full(len(V), -np.inf)       # max similarità di ogni candidato con i già selezionati
+    available = np.ones(len(V), dtype=bool)
     selected: List[int] = []
-    remaining = set(range(len(V)))
 
     while len(selected) < min(k, len(V)):
         if not selected:
             # pick the highest similarity first
-            best = max(remaining, key=lambda i: sims[i])
-            selected.append(best)
-            remaining.remove(best)
-            continue
-        best_idx = None
-        best_score = -1e9
-        for i in remaining:
-            max_div = max([cos(V[i], V[j]) for j in selected]) if selected else 0.0
-            score = lambda_mult * sims[i] - (1 - lambda_mult) * max_div
-            if score > best_score:
-                best_score = score
-                best_idx = i
-        selected.append(best_idx)
-        remaining.remove(best_idx)
+            scores = sims.copy()
+        else:
+            scores = lambda_mult * sims - (1 - lambda_mult) * max_div
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))        # a parità di score vince l'indice minore, come prima
+        selected.append(best)
+        available[best] = False
+        # aggiornamento incrementale: un prodotto matrice-vettore per ogni selezione
+        np.maximum(max_div, V @ V[best], out=max_div)
     return selected
 
-def hybrid_search(
+def normalize_scores(scores: Dict[Any, float]) -> Dict[Any, float]:
+    if not scores:
+        return {}
+    smin, smax = min(scores.values()), max(scores.values())
+    # robusto al caso smin==smax
+    return {pid: 1.0 if smax == smin else (s - smin) / (smax - smin) for pid, s in scores.items()}
+
+def reciprocal_rank_fusion(rankings: List[List[Any]], weights: List[float], k: int = 60) -> Dict[Any, float]:
+    fused: Dict[Any, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, pid in enumerate(ranking, start=1):
+            fused[pid] = fused.get(pid, 0.0) + weight / (k + rank)
+    return fused
+
+def weighted_score_fusion(score_maps: List[Dict[Any, float]], weights: List[float]) -> Dict[Any, float]:
+    fused: Dict[Any, float] = {}
+    for scores, weight in zip(score_maps, weights):
+        for pid, s in normalize_scores(scores).items():
+            fused[pid] = fused.get(pid, 0.0) + weight * s
+    return fused
+
+def retrieve_scored_points(
     client: QdrantClient,
     collection_name: str,
-    settings: Settings,
-    query: str,
-    embeddings: OpenAIEmbeddings
-):
-    
-    # (1) semantica
+    scores: Dict[Any, float],
+    with_vectors: bool = False
+) -> List[ScoredPoint]:
+    # payload (ed eventualmente vettori) dei candidati trovati solo dal ramo lessicale
+    records = client.retrieve(
+        collection_name=collection_name,
+        ids=list(scores),
+        with_payload=True,
+        with_vectors=with_vectors,
+    )
+    return [
+        ScoredPoint(id=r.id, version=0, score=scores[r.id], payload=r.payload, vector=r.vector)
+        for r in records
+    ]
+
+def candidates_limit(settings: Settings) -> int:
+    # con MMR servono i primi final_top_k * 5 candidati dopo la fusione, altrimenti solo final_top_k
+    return max(settings.final_top_k * 5, settings.final_top_k) if settings.mmr else settings.final_top_k
+
+def use_rank_fusion(settings: Settings, lexical_index: Optional[BM25Index]) -> bool:
+    return settings.fusion in ("rrf", "weighted") and lexical_index is not None
+
+def boost_fusion(
+    ctx: QueryContext,
+    sem: List[ScoredPoint],
+    text_ids: set
+) -> List[Tuple[float, Any]]:
+    settings = ctx.settings
+    ctx.semantic_scores = {p.id: p.score for p in sem}
+
+    # Normalizzazione score semantici per fusione
+    base = normalize_scores(ctx.semantic_scores)  # [0..1]
+
+    # fusione con boost testuale
+    fused: List[Tuple[float, Any]] = []  # (fused_score, point)
+    for p in sem:
+        fuse = settings.alpha * base[p.id]
+        if p.id in text_ids:
+            fuse += settings.text_boost         # boost additivo
+        fused.append((fuse, p))
+    return fused
+
+def rank_fusion_candidates(
+    ctx: QueryContext,
+    sem: List[ScoredPoint],
+    lexical: List[Tuple[str, float]]
+) -> Tuple[List[Any], Dict[Any, float], Dict[Any, float]]:
+    """
+    Fuses the dense and BM25 rankings.
+    Returns the ids of the top candidates, the fused scores and the BM25 scores of the candidates
+    found only by the lexical branch, whose payload still has to be retrieved.
+    """
+    settings = ctx.settings
+    semantic_weight, lexical_weight = settings.alpha, 1.0 - settings.alpha
+
+    ctx.semantic_scores = {p.id: p.score for p in sem}
+    ctx.lexical_scores = dict(lexical)
+
+    if settings.fusion == "rrf":
+        fused_scores = reciprocal_rank_fusion(
+            [[p.id for p in sem], [pid for pid, _ in lexical]],
+            [semantic_weight, lexical_weight],
+            k=settings.rrf_k,
+        )
+    else:
+        fused_scores = weighted_score_fusion(
+            [ctx.semantic_scores, ctx.lexical_scores],
+            [semantic_weight, lexical_weight],
+        )
+
+    # solo i candidati che possono finire nel risultato servono con payload
+    top_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:candidates_limit(settings)]
+    lexical_only = {pid: ctx.lexical_scores[pid] for pid in top_ids if pid not in ctx.semantic_scores}
+    return top_ids, fused_scores, lexical_only
+
+def boost_fusion_search(
+    client: QdrantClient,
+    collection_name: str,
+    ctx: QueryContext
+) -> List[Tuple[float, Any]]:
+    settings = ctx.settings
+
+    # (1) semantica (senza vettori: servono solo a MMR e solo per i candidati finali)
     sem = qdrant_semantic_search(
-        client, collection_name, query, embeddings,
-        limit=settings.top_n_semantic, with_vectors=True
+        client, collection_name, ctx,
+        limit=settings.top_n_semantic
     )
     if not sem:
         return []
 
-    # (2) full-text prefilter (id)
-    text_ids = set(qdrant_text_prefilter_ids(client, collection_name, query, settings.top_n_text))
-
-    # Normalizzazione score semantici per fusione
-    scores = [p.score for p in sem]
-    smin, smax = min(scores), max(scores)
-    def norm(x):  # robusto al caso smin==smax
-        return 1.0 if smax == smin else (x - smin) / (smax - smin)
+    # (2) full-text prefilter (id), inutile se il boost è nullo
+    text_ids = set(qdrant_text_prefilter_ids(client, collection_name, ctx, settings.top_n_text)) if settings.text_boost else set()
 
     # (3) fusione con boost testuale
-    fused: List[Tuple[int, float, Any]] = []  # (idx, fused_score, point)
-    for idx, p in enumerate(sem):
-        base = norm(p.score)                    # [0..1]
-        fuse = settings.alpha * base
-        if p.id in text_ids:
-            fuse += settings.text_boost         # boost additivo
-        fused.append((idx, fuse, p))
+    return boost_fusion(ctx, sem, text_ids)
 
-    # ordina per fused_score desc
-    fused.sort(key=lambda t: t[1], reverse=True)
+def rank_fusion_search(
+    client: QdrantClient,
+    collection_name: str,
+    ctx: QueryContext,
+    lexical_index: BM25Index
+) -> List[Tuple[float, Any]]:
+    settings = ctx.settings
 
-    # MMR opzionale per diversificare i top-K
-    if settings.mmr:
-        qv = embeddings.embed_query(query)
-        # prendiamo i primi N dopo fusione (es. 30) e poi MMR per final_k
-        N = min(len(fused), max(settings.final_top_k * 5, settings.final_top_k))
-        cut = fused[:N]
-        vecs = [sem[i].vector for i, _, _ in cut]
-        mmr_idx = mmr_select(qv, vecs, settings.final_top_k, settings.mmr_lambda)
-        picked = [cut[i][2] for i in mmr_idx]
-        return picked
-
-    # altrimenti, prendi i primi final_k dopo fusione
-    return [p for _, _, p in fused[:settings.final_top_k]]
-
-def format_docs_for_prompt(points: Iterable[Any]) -> str:
-    blocks = []
-    for p in points:
-        pay = p.payload or {}
-        src = pay.get("source", "unknown")
-        blocks.append(f"[source:{src}] {pay.get('text','')}")
-    return "\n\n".join(blocks)
+    # ogni ramo viene eseguito solo se ha peso: con alpha=0 (Text Search) niente ricerca densa
+    sem = qdrant_semantic_search(
+        client, collection_name, ctx,
+        limit=settings.top_n_semantic
+    ) if settings.alpha > 0 else []
+    lexical = lexical_index.search(ctx.tokens, settings.top_n_text) if settings.alpha < 1 else []
 
-def execute_rag(query:str):
+    top_ids, fused_scores, lexical_only = rank_fusion_candidates(ctx, sem, lexical)
+
+    points = {p.id: p for p in sem}
+    if lexical_only:
+        for p in retrieve_scored_points(client, collection_name, lexical_only):
+            points[p.id] = p
+
+    return [(fused_scores[pid], points[pid]) for pid in top_ids if pid in points]
+
+def server_fusion_request(ctx: QueryContext, limit: int, with_vectors: bool = False) -> dict:
     """
-    This funcition, given a query written by the user in natural language, 
-    performs a RAG (Retrieval-Augmented Generation) process to retrieve relevant documents from a Qdrant vector store 
-    and format them for further use.
+    Arguments of the single query_points call of the server-side hybrid retrieval (Query API).
+    The dense candidates and the text candidates (MatchText-filtered dense search, i.e. the text matches
+    re-scored by similarity) are two prefetch branches, fused server side with RRF
+    (or DBSF for the "weighted" fusion). With settings.server_rescore the fused pool is
+    re-scored once more against the full-precision query vector.
+    """
+    settings = ctx.settings
+    search_params = SearchParams(hnsw_ef=256, exact=False)
+
+    prefetch = []
+    if settings.alpha > 0:
+        prefetch.append(Prefetch(query=ctx.vector, limit=settings.top_n_semantic, params=search_params))
+    if settings.alpha < 1:
+        prefetch.append(Prefetch(query=ctx.vector, filter=ctx.text_filter, limit=settings.top_n_text, params=search_params))
+
+    fusion = FusionQuery(fusion=Fusion.DBSF if settings.fusion == "weighted" else Fusion.RRF)
+    if settings.server_rescore:
+        prefetch = [Prefetch(prefetch=prefetch, query=fusion, limit=max(settings.top_n_semantic, settings.top_n_text))]
+        query = ctx.vector
+        search_params = SearchParams(quantization=QuantizationSearchParams(rescore=True))
+    else:
+        query = fusion
+        search_params = None
+
+    return dict(
+        prefetch=prefetch,
+        query=query,
+        limit=limit,
+        with_payload=True,
+        with_vectors=with_vectors,
+        search_params=search_params,
+    )
 
-    Args:
-        query (str): The user's natural language query.
+def server_fusion_search(
+    client: QdrantClient,
+    collection_name: str,
+    ctx: QueryContext,
+    limit: int,
+    with_vectors: bool = False
+) -> List[Tuple[float, Any]]:
+    res = client.query_points(collection_name=collection_name, **server_fusion_request(ctx, limit, with_vectors))
+    return [(p.score, p) for p in res.points]
 
-    Returns:
-        str: Formatted string containing the retrieved documents' content and sources.
+def retrieve_vectors(client: QdrantClient, collection_name: str, ids: List[Any]) -> np.ndarray:
     """
-    settings = Settings()
+    Fetches the vectors of the given points with one batched retrieve call and decodes them
+    into a contiguous float32 matrix, one row per id in the given order.
+    """
+    records = client.retrieve(
+        collection_name=collection_name,
+        ids=ids,
+        with_payload=False,
+        with_vectors=True,
+    )
+    return vectors_matrix(ids, records)
 
-    embedding_model = get_embedding_model()
+def vectors_matrix(ids: List[Any], records: List[Any]) -> np.ndarray:
+    by_id = {r.id: r.vector for r in records}
+    V = np.empty((len(ids), VECTOR_SIZE), dtype=np.float32)
+    for row, pid in enumerate(ids):
+        V[row] = by_id[pid]
+    return V
+
+def rank_fused(ctx: QueryContext, fused: List[Tuple[float, Any]]) -> List[Tuple[float, Any]]:
+    """Sorts the fused candidates, records their scores in ctx and keeps the ones needed downstream."""
+    # ordina per fused_score desc
+    fused.sort(key=lambda t: t[0], reverse=True)
+    ctx.fused_scores = {p.id: score for score, p in fused}
+    # con MMR i primi N dopo fusione (es. 30) da diversificare, altrimenti i primi final_k
+    return fused[:candidates_limit(ctx.settings)]
+
+def apply_mmr(ctx: QueryContext, cut: List[Tuple[float, Any]], vectors: np.ndarray) -> List[Any]:
+    mmr_idx = mmr_select(ctx.vector, vectors, ctx.settings.final_top_k, ctx.settings.mmr_lambda)
+    return [cut[i][1] for i in mmr_idx]
+
+def hybrid_search(
+    client: QdrantClient,
+    collection_name: str,
+    ctx: QueryContext,
+    lexical_index: Optional[BM25Index] = None
+):
+    """
+    Retrieves the final_top_k chunks for the query, fusing the semantic and the lexical ranking.
+    settings.fusion selects the strategy:
+    - "boost": min-max normalized cosine score plus a flat text_boost for MatchText hits;
+    - "rrf": reciprocal rank fusion of the dense and BM25 rankings, weighted by alpha / 1 - alpha;
+    - "weighted": weighted sum of the min-max normalized dense and BM25 scores.
+    The BM25 strategies need the lexical index of the collection, otherwise "boost" is used.
+    With settings.retrieval_mode="server" the fusion runs inside Qdrant instead (see server_fusion_request);
+    on the local store, which has no Query API, the client-side fusion is used.
+    Fused scores are kept in ctx.fused_scores. On the client-side paths the returned points keep the score
+    of the branch that retrieved them and the raw cosine scores of the dense branch are kept in ctx.semantic_scores;
+    on the server-side path the points carry the fused RRF / DBSF score (or the rescored cosine with server_rescore)
+    and ctx.semantic_scores stays empty, so only min_fused_score applies to the relevance gate.
+    """
+    settings = ctx.settings
+
+    if settings.retrieval_mode == "server" and supports_query_api(client):
+        fused = server_fusion_search(client, collection_name, ctx, limit=candidates_limit(settings))
+    elif use_rank_fusion(settings, lexical_index):
+        fused = rank_fusion_search(client, collection_name, ctx, lexical_index)
+    else:
+        fused = boost_fusion_search(client, collection_name, ctx)
+    if not fused:
+        return []
+
+    cut = rank_fused(ctx, fused)
 
-    vector_store = get_qdrant_client(settings)
-    vector_size = 1536
+    # MMR opzionale per diversificare i top-K: i vettori si scaricano solo ora e solo per i candidati rimasti
+    if settings.mmr:
+        return apply_mmr(ctx, cut, retrieve_vectors(client, collection_name, [p.id for _, p in cut]))
 
-    COLLECTION_NAME = "medicine_collection"
+    return [p for _, p in cut]
 
-    docs = load_documents()
-    print("Docs loaded:", len(docs))
-    chunks = split_documents(docs, settings)
-    recreate_collection_for_rag(vector_store, COLLECTION_NAME, vector_size)
-    upsert_chunks(vector_store, COLLECTION_NAME, chunks, embedding_model)
+def relevance_scores(ctx: QueryContext) -> Tuple[Optional[float], Optional[float]]:
+    """Best raw cosine score of the dense branch and best fused score of the last search (None if unavailable)."""
+    best_semantic = max(ctx.semantic_scores.values()) if ctx.semantic_scores else None
+    best_fused = max(ctx.fused_scores.values()) if ctx.fused_scores else None
+    return best_semantic, best_fused
 
-    points = hybrid_search(vector_store, COLLECTION_NAME, settings, query, embedding_model)
+def passes_relevance_gate(ctx: QueryContext) -> bool:
+    """
+    Whether the retrieved chunks are worth an LLM call: the best candidate must reach
+    settings.min_semantic_score (raw cosine) and settings.min_fused_score, when set.
+    The fused scale depends on the fusion method, so the thresholds are calibrated per configuration
+    (see benchmarks/calibrate_relevance_gate.py). Without dense branch scores (alpha=0, or retrieval_mode="server",
+    where Qdrant returns only the fused score) min_semantic_score cannot be evaluated and only min_fused_score applies.
+    """
+    settings = ctx.settings
+    best_semantic, best_fused = relevance_scores(ctx)
+    if best_fused is None:
+        return False
+    if settings.min_semantic_score is not None:
+        if best_semantic is None:
+            # senza ramo denso (Text Search o fusione lato server) la soglia coseno non è valutabile
+            print(f"⚠️ min_semantic_score not applied (retrieval_mode={settings.retrieval_mode}, alpha={settings.alpha}): only min_fused_score gates the results.")
+        elif best_semantic < settings.min_semantic_score:
+            return False
+    if settings.min_fused_score is not None and best_fused < settings.min_fused_score:
+        return False
+    return True
+
+def log_results(query: str, points: List[Any]):
     print("=" * 80)
     print("Q:", query)
     if not points:
         print("No results found in vector store.")
     for p in points:
         print(f"- id={p.id} score={p.score:.4f} src={p.payload.get('source')}")
-    
-    context = format_docs_for_prompt(points)
 
-    return context
+def retrieve_chunks(query: str, settings: Optional[Settings] = None) -> List[Any]:
+    """
+    Retrieves the chunks relevant to the query from the already ingested collection
+    (see ingestion_tool.ingest_documents): no document is loaded or embedded here.
+    Returns an empty list when nothing was ingested or the best chunk is below the relevance thresholds.
+    """
+    settings = settings or load_settings()
+
+    manifest = get_manifest(COLLECTION_NAME)
+    if manifest is None:
+        print(f"No manifest found for {COLLECTION_NAME}: documents have not been ingested yet.")
+        return []
+
+    embedding_model = get_embedding_model()
+
+    vector_store = get_vector_store(settings, manifest, COLLECTION_NAME)
+    if not vector_store.collection_exists(COLLECTION_NAME):
+        print(f"Collection {COLLECTION_NAME} not found in vector store: run the ingestion first.")
+        return []
+
+    ctx = QueryContext(query, settings, embedding_model)
+    points = hybrid_search(vector_store, COLLECTION_NAME, ctx, get_bm25_index(COLLECTION_NAME))
+    log_results(query, points)
+
+    if not passes_relevance_gate(ctx):
+        print(f"Retrieval scores {relevance_scores(ctx)} below the relevance thresholds: no context.")
+        return []
+    return points
+
+def execute_rag(query:str, settings: Optional[Settings] = None):
+    """
+    This funcition, given a query written by the user in natural language, 
+    performs a RAG (Retrieval-Augmented Generation) process to retrieve relevant documents from a Qdrant vector store 
+    and format them for further use.
+    The collection must already have been built by the ingestion pipeline (see ingestion_tool.ingest_documents):
+    no document is loaded or embedded here.
+    An empty string is returned when the best retrieved chunk is below the relevance thresholds.
+
+    Args:
+        query (str): The user's natural language query.
+        settings (Settings, optional): RAG settings of the request (default: the ones of rag_config.json).
+
+    Returns:
+        str: Formatted string containing the retrieved documents' content and sources,
+             packed within the context token budget (see context_packer.pack_context).
+    """
+    settings = settings or load_settings()
+    points = retrieve_chunks(query, settings)
+    return pack_context(points, settings, indexed_chunk_overlap(COLLECTION_NAME, settings)).text
@@ -0,0 +1,123 @@
+import time
+import uuid
+import asyncio
+import threading
+
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.tools.async_rag_tool import aretrieve_chunks
+from src.multi_agent_system.tools.async_runtime import get_event_loop
+
+# una speculazione mai consumata né scartata (es. grafo interrotto da un errore) scade dopo questo tempo
+SPECULATION_TTL_SECONDS = 120
+
+class SpeculationMetrics:
+    """Thread-safe counters of the speculative retrievals: how many were used and how many were wasted."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.consumed = 0
+        self.wasted = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.wait_seconds = 0.0
+
+    def record(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "consumed": self.consumed,
+                # scartate perché la query non è andata al RAG (cancelled: interrotte prima di finire)
+                "wasted": self.wasted,
+                "cancelled": self.cancelled,
+                "expired": self.expired,
+                "wasted_ratio": (self.wasted + self.expired) / self.started if self.started else 0.0,
+                # attesa residua del nodo RAG: la parte di retrieval non nascosta dietro i classificatori
+                "mean_wait_ms": 1000 * self.wait_seconds / self.consumed if self.consumed else 0.0,
+            }
+
+metrics = SpeculationMetrics()
+
+_pending: Dict[str, Tuple[str, Future, float]] = {}
+_pending_lock = threading.Lock()
+
+def _expire_stale(now: float):
+    for spec_id, (_, future, started_at) in list(_pending.items()):
+        if now - started_at > SPECULATION_TTL_SECONDS:
+            del _pending[spec_id]
+            future.cancel()
+            metrics.record(expired=1)
+
+def start_speculative_retrieval(query: str, settings: Optional[Settings] = None) -> str:
+    """
+    Starts the retrieval half of the RAG pipeline (query embedding + hybrid_search) on the shared
+    event loop, without waiting for it, and returns the id to consume or discard it with.
+    """
+    # le impostazioni della richiesta passano esplicitamente: il retrieval gira fuori dal contesto del grafo
+    future = asyncio.run_coroutine_threadsafe(aretrieve_chunks(query, settings), get_event_loop())
+    spec_id = str(uuid.uuid4())
+    with _pending_lock:
+        _expire_stale(time.monotonic())
+        _pending[spec_id] = (query, future, time.monotonic())
+    metrics.record(started=1)
+    return spec_id
+
+def _take(spec_id: str, query: str) -> Optional[Future]:
+    with _pending_lock:
+        entry = _pending.pop(spec_id, None)
+    if entry is None:
+        return None
+    spec_query, future, _ = entry
+    if spec_query != query:
+        future.cancel()
+        metrics.record(wasted=1)
+        return None
+    return future
+
+def consume_speculative_retrieval(spec_id: str, query: str) -> Optional[List[Any]]:
+    """
+    Waits for the speculative retrieval and returns the retrieved chunks,
+    or None if there is none for this id and query (the caller then runs the retrieval itself).
+    """
+    future = _take(spec_id, query)
+    if future is None:
+        return None
+
+    start = time.perf_counter()
+    try:
+        return future.result()
+    finally:
+        metrics.record(consumed=1, wait_seconds=time.perf_counter() - start)
+
+async def aconsume_speculative_retrieval(spec_id: str, query: str) -> Optional[List[Any]]:
+    """Async variant of consume_speculative_retrieval: waits without blocking the event loop."""
+    future = _take(spec_id, query)
+    if future is None:
+        return None
+
+    start = time.perf_counter()
+    try:
+        return await asyncio.wrap_future(future)
+    finally:
+        metrics.record(consumed=1, wait_seconds=time.perf_counter() - start)
+
+def discard_speculative_retrieval(spec_id: str):
+    """Cancels the speculative retrieval of a query that was not routed to the RAG."""
+    with _pending_lock:
+        entry = _pending.pop(spec_id, None)
+    if entry is None:
+        return
+    # cancel() fallisce se il retrieval è già terminato: in quel caso il lavoro è già stato speso
+    cancelled = entry[1].cancel()
+    metrics.record(wasted=1, cancelled=int(cancelled))
+
+def get_speculation_metrics() -> dict:
+    return metrics.snapshot()
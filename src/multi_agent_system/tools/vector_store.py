@@ -0,0 +1,61 @@
+"""
+Vector store backends of the RAG pipeline.
+
+Ingestion and retrieval talk to the vector store only through this subset of the QdrantClient API:
+    collection_exists, recreate_collection, create_payload_index, upload_points, upsert,
+    batch_update_points (set payload), delete (filter selector), count,
+    query_points (dense query; prefetch only on Qdrant), scroll (payload filter), retrieve.
+Two backends implement it:
+    - "qdrant": the pooled QdrantClient / AsyncQdrantClient (see qdrant_clients.py);
+    - "local": the in-process LocalVectorStore (see local_vector_store.py), exact search
+      over a memory-mapped matrix, for small corpora and Qdrant-free runs.
+The backend of a collection is chosen at ingestion time from the corpus size and recorded in its manifest.
+"""
+import os
+
+from typing import Any, Optional
+
+from src.multi_agent_system.config.rag_settings import Settings
+from src.multi_agent_system.tools.qdrant_clients import get_qdrant_client, get_async_qdrant_client
+from src.multi_agent_system.tools.local_vector_store import (
+    LOCAL_STORE_PATH,
+    LocalVectorStore,
+    AsyncLocalVectorStore,
+    get_local_vector_store,
+)
+
+def estimate_points(input_files_path: str, settings: Settings) -> int:
+    """Rough number of chunks of the input directory, from the file sizes and the splitting settings."""
+    total_bytes = sum(
+        os.path.getsize(os.path.join(input_files_path, filename))
+        for filename in os.listdir(input_files_path)
+    )
+    stride = max(1, settings.chunk_size - settings.chunk_overlap)
+    return total_bytes // stride + 1
+
+def choose_backend(settings: Settings, estimated_points: int) -> str:
+    if settings.vector_backend in ("qdrant", "local"):
+        return settings.vector_backend
+    # "auto": i corpus piccoli evitano il round trip verso il server
+    return "local" if estimated_points <= settings.local_max_points else "qdrant"
+
+def open_vector_store(settings: Settings, backend: str) -> Any:
+    """Writable store for the ingestion (the local backend gets a private copy, flushed at the end)."""
+    if backend == "local":
+        return LocalVectorStore(LOCAL_STORE_PATH, dtype=settings.local_store_dtype)
+    return get_qdrant_client(settings)
+
+def get_vector_store(settings: Settings, manifest: Optional[dict], collection_name: str) -> Any:
+    """Store to query for a collection, according to the backend recorded in its manifest."""
+    if manifest and manifest.get("backend") == "local":
+        return get_local_vector_store(collection_name)
+    return get_qdrant_client(settings)
+
+def get_async_vector_store(settings: Settings, manifest: Optional[dict], collection_name: str) -> Any:
+    if manifest and manifest.get("backend") == "local":
+        return AsyncLocalVectorStore(get_local_vector_store(collection_name))
+    return get_async_qdrant_client(settings)
+
+def supports_query_api(store: Any) -> bool:
+    # la fusione lato server (prefetch) esiste solo su Qdrant
+    return not isinstance(store, (LocalVectorStore, AsyncLocalVectorStore))
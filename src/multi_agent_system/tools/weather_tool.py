@@ -1,6 +1,8 @@
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 from geopy import Nominatim
-import requests
+from geopy.adapters import AioHTTPAdapter
+
+from src.multi_agent_system.models.http_client import get_http_client, get_async_http_client
 
 def get_location_coordinates(location: str) -> str:
     """Get the coordinates for a given location."""
@@ -20,24 +22,30 @@ def get_location_coordinates(location: str) -> str:
         }
     return coordinates_dict  # Coordinates for New York City
 
-@tool
-def get_weather(location: str, start_date: str, end_date: str) -> str:
-    """Tool to get weather information for a given location and date range.
-    Args:
-        location (str): The location to get the weather for.
-        start_date (str): The start date in YYYY-MM-DD format.
-        end_date (str): The end date in YYYY-MM-DD format.
-    
-    Returns:
-        dict: A dictionary containing weather information.
-    """
-    coordinates = get_location_coordinates(location)
+async def aget_location_coordinates(location: str) -> str:
+    """Async variant of get_location_coordinates (geopy with the aiohttp adapter)."""
+    try:
+        async with Nominatim(user_agent="exercise_app", adapter_factory=AioHTTPAdapter) as geolocator:
+            loc = await geolocator.geocode(location)
+        if loc:
+            coordinates_dict = {
+                "latitude": loc.latitude, 
+                "longitude": loc.longitude
+                }
+    except Exception as e:
+        print(f"Error fetching coordinates for {location}: {e}")
+        coordinates_dict = {
+            "latitude": 40.7128,  # Default to New York City coordinates
+            "longitude": -74.0060
+        }
+    return coordinates_dict
 
+def forecast_url(coordinates: dict, start_date: str, end_date: str) -> str:
     latitude = coordinates["latitude"]
     longitude = coordinates["longitude"]
 
     # Costruzione URL API
-    url = (
+    return (
         "https://api.open-meteo.com/v1/forecast"
         f"?latitude={latitude}"
         f"&longitude={longitude}"
@@ -45,8 +53,20 @@ def get_weather(location: str, start_date: str, end_date: str) -> str:
         f"&start_date={start_date}"
         f"&end_date={end_date}"
     )
+
+def fetch_weather(location: str, start_date: str, end_date: str) -> str:
+    """Tool to get weather information for a given location and date range.
+    Args:
+        location (str): The location to get the weather for.
+        start_date (str): The start date in YYYY-MM-DD format.
+        end_date (str): The end date in YYYY-MM-DD format.
+    
+    Returns:
+        dict: A dictionary containing weather information.
+    """
+    url = forecast_url(get_location_coordinates(location), start_date, end_date)
     try:
-        response = requests.get(url)
+        response = get_http_client().get(url)
         response.raise_for_status()
         data = response.json()
     except Exception as e:
@@ -56,3 +76,22 @@ def get_weather(location: str, start_date: str, end_date: str) -> str:
     print(data)
     print(type(data))
     return data
+
+
+async def afetch_weather(location: str, start_date: str, end_date: str) -> str:
+    """Async variant of fetch_weather: geocoding and forecast request without blocking the event loop."""
+    url = forecast_url(await aget_location_coordinates(location), start_date, end_date)
+    try:
+        response = await get_async_http_client().get(url)
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        return f"Errore durante la richiesta API: {e}"
+
+    print("Weather Tool - Weather data:")
+    print(data)
+    print(type(data))
+    return data
+
+# stesso tool per invoke e ainvoke: il grafo async usa la variante non bloccante
+get_weather = StructuredTool.from_function(func=fetch_weather, coroutine=afetch_weather, name="get_weather")